@@ -0,0 +1,50 @@
+"""
+Compare the ORM unit of work with Database.bulk_insert on SQLite.
+
+    python -m benchmarks.bench_bulk
+"""
+import time
+
+from sqlalchemy import Column, Integer, String
+from sqlalchemy.orm import declarative_base
+
+from fast_sqlalchemy.persistence.database import Database
+
+Base = declarative_base()
+ROWS = 50_000
+
+
+class User(Base):
+    __tablename__ = "users"
+    id = Column(Integer, primary_key=True)
+    email = Column(String)
+    name = Column(String)
+
+
+def rows():
+    return ({"email": f"{i}@mail.com", "name": str(i)} for i in range(ROWS))
+
+
+def bench(name, insert):
+    db = Database("sqlite://")
+    Base.metadata.create_all(db.engine)
+    with db.session_ctx():
+        start = time.perf_counter()
+        insert(db)
+        db.session.commit()
+        duration = time.perf_counter() - start
+    print(f"{name:<12} {ROWS} rows in {duration:.3f}s ({ROWS / duration:,.0f} rows/s)")
+
+
+def orm_insert(db):
+    for row in rows():
+        db.session.add(User(**row))
+
+
+def main():
+    bench("orm add", orm_insert)
+    bench("bulk_insert", lambda db: db.bulk_insert(User, rows()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Measure the emit throughput of the LocalEventBus, with handlers on the event type and on its parent.
+
+    python -m benchmarks.bench_event_bus
+"""
+import time
+
+from fast_sqlalchemy.event_bus.bus import LocalEventBus
+from fast_sqlalchemy.event_bus.contexts import event_bus_store, event_queue_ctx
+from fast_sqlalchemy.event_bus.emit import emit
+
+EVENTS = 500_000
+
+
+class DomainEvent:
+    pass
+
+
+class UserCreated(DomainEvent):
+    pass
+
+
+class UserDeleted(DomainEvent):
+    pass
+
+
+def bench(name, event_type):
+    bus = LocalEventBus()
+    bus.subscribe(UserCreated, lambda e: None)
+    for _ in range(5):
+        bus.subscribe(UserCreated, lambda e: None, on_publish=True)
+    bus.subscribe(DomainEvent, lambda e: None)
+    event_bus_store.add(bus)
+    try:
+        with event_queue_ctx():
+            event = event_type()
+            start = time.perf_counter()
+            for _ in range(EVENTS):
+                emit(event)
+            duration = time.perf_counter() - start
+    finally:
+        event_bus_store.discard(bus)
+    print(f"{name:<20} {EVENTS} events in {duration:.3f}s ({EVENTS / duration:,.0f} events/s)")
+
+
+def main():
+    bench("subscribed type", UserCreated)
+    bench("parent handler only", UserDeleted)
+
+
+if __name__ == "__main__":
+    main()
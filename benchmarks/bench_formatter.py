@@ -0,0 +1,40 @@
+"""
+Compare the records formatted per second by the ColorFormatter and the JSONFormatter, with the json module and
+with orjson when it's installed.
+
+    python -m benchmarks.bench_formatter
+"""
+import logging
+import time
+
+from fast_sqlalchemy.logging import formatter
+from fast_sqlalchemy.logging.formatter import ColorFormatter, JSONFormatter
+
+RECORDS = 200_000
+
+
+def record():
+    return logging.LogRecord("app.users", logging.INFO, __file__, 10, "user %s created", (1,), None,
+                             func="create_user")
+
+
+def bench(name, log_formatter):
+    records = [record() for _ in range(RECORDS)]
+    start = time.perf_counter()
+    for r in records:
+        log_formatter.format(r)
+    duration = time.perf_counter() - start
+    print(f"{name:<16} {RECORDS} records in {duration:.3f}s ({RECORDS / duration:,.0f} records/s)")
+
+
+def main():
+    bench("color", ColorFormatter())
+    bench("json", JSONFormatter(dumps=formatter._json_dumps))
+    if formatter.orjson is not None:
+        bench("json (orjson)", JSONFormatter(dumps=formatter._orjson_dumps))
+    else:
+        print("orjson isn't installed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Measure the throughput of the IPCEventBus from one publishing process to N receiving processes.
+
+    python -m benchmarks.bench_ipc_event_bus [processes]
+"""
+import asyncio, multiprocessing, sys, tempfile, time
+from dataclasses import dataclass
+
+from fast_sqlalchemy.event_bus.bus import LocalEventBus
+from fast_sqlalchemy.event_bus.ipc import IPCEventBus
+
+EVENTS = 200_000
+BATCH = 100
+
+
+@dataclass
+class CacheInvalidated:
+    key: str
+
+
+def receive(directory: str, ready, done):
+    async def main():
+        received = 0
+        finished = asyncio.Event()
+        bus = LocalEventBus()
+
+        @bus.batch_handler(CacheInvalidated)
+        async def count(events):
+            nonlocal received
+            received += len(events)
+            if received >= EVENTS:
+                finished.set()
+
+        ipc_bus = IPCEventBus(bus, directory)
+        await ipc_bus.start()
+        ready.put(True)
+        await finished.wait()
+        await ipc_bus.stop()
+        done.put(received)
+    asyncio.run(main())
+
+
+async def publish(directory: str):
+    bus = LocalEventBus()
+
+    @bus.batch_handler(CacheInvalidated)
+    async def handle(events):
+        pass
+
+    ipc_bus = IPCEventBus(bus, directory, name="publisher")
+    events = [CacheInvalidated(str(i)) for i in range(BATCH)]
+    for _ in range(EVENTS // BATCH):
+        await ipc_bus.async_handle_events(events)
+    await ipc_bus.stop()
+
+
+def main(processes: int):
+    with tempfile.TemporaryDirectory() as directory:
+        ready, done = multiprocessing.Queue(), multiprocessing.Queue()
+        receivers = [multiprocessing.Process(target=receive, args=(directory, ready, done)) for _ in range(processes)]
+        for receiver in receivers:
+            receiver.start()
+        for _ in receivers:
+            ready.get()
+        start = time.perf_counter()
+        asyncio.run(publish(directory))
+        for _ in receivers:
+            done.get()
+        duration = time.perf_counter() - start
+        for receiver in receivers:
+            receiver.join()
+    print(f"{processes} processes: {EVENTS} events in batches of {BATCH} in {duration:.3f}s "
+          f"({EVENTS * processes / duration:,.0f} deliveries/s)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 4)
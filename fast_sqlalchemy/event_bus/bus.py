@@ -1,7 +1,10 @@
-import inspect, asyncio, logging
+import inspect, asyncio, contextvars, functools, logging, time
 from abc import ABC, abstractmethod
 from collections import defaultdict
-from typing import Callable, List, Tuple, Iterable
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple, Iterable, Optional
+
+from fast_sqlalchemy.event_bus.metrics import metrics_hooks
 
 logger = logging.getLogger(__name__)
 
@@ -33,19 +36,66 @@ class EventHandler:
         """
         self.func(event)
 
-    async def async_handle(self, event):
+    async def async_handle(self, event, executor: Optional[Executor] = None):
         """
         Asynchronously handle an event.
 
         If the encapsulated function is a coroutine function, it is awaited.
-        Otherwise, it is executed in a separate thread using asyncio.to_thread.
+        Otherwise, it is executed in a separate thread of the executor with the current context,
+        like asyncio.to_thread.
 
         :param event: The event to be handled.
+        :param executor: The executor of the sync functions, defaults to the executor of the event loop.
         """
         if inspect.iscoroutinefunction(self.func):
             await self.func(event)
         else:
-            self.func(event)
+            context = contextvars.copy_context()
+            await asyncio.get_running_loop().run_in_executor(executor,
+                                                             functools.partial(context.run, self.func, event))
+
+
+class BatchEventHandler(EventHandler):
+    """
+    An on_publish event handler called once with the list of the published events instead of once per event.
+
+    :param func: The function to be called with the list of events.
+    :param max_batch: The maximum number of events of a call, the events are split in several calls beyond.
+    :param key: A function which returns the key of an event, only the latest event of each key is handled.
+    """
+    def __init__(self, func, max_batch: Optional[int] = None, key: Optional[Callable] = None):
+        super().__init__(func, on_publish=True)
+        self.max_batch = max_batch
+        self.key = key
+
+    def batches(self, events: List) -> List[List]:
+        """
+        Coalesce the events by key and split them in batches of max_batch events.
+
+        :param events: The events to handle.
+        """
+        if self.key is not None:
+            latest = {}
+            for event in events:
+                key = self.key(event)
+                # the latest event takes the place of the previous one in the order of the events
+                latest.pop(key, None)
+                latest[key] = event
+            events = list(latest.values())
+        size = self.max_batch or len(events)
+        return [events[i:i + size] for i in range(0, len(events), size)]
+
+
+class EventHandlingError(Exception):
+    """
+    Raised once all the handlers of a publish ran when some of them failed or timed out.
+
+    :param failures: The failed handlers with their event and their error
+    """
+    def __init__(self, failures: List[Tuple[EventHandler, object, BaseException]]):
+        super().__init__(f"{len(failures)} event handlers failed: "
+                         + ", ".join(f"{_handler_name(handler)}: {error!r}" for handler, _, error in failures))
+        self.failures = failures
 
 
 class EventBus(ABC):
@@ -72,8 +122,21 @@ class LocalEventBus(EventBus):
     >>> event_bus.subscribe("event_type1", my_handler)
     >>> event_bus.subscribe("event_type2", my_handler)
     """
-    def __init__(self):
+    def __init__(self, max_concurrency=100, handler_timeout: Optional[float] = None, max_workers: Optional[int] = None):
+        """
+        :param max_concurrency: The maximum number of coroutine on_publish handlers running at once for a publish,
+            1 preserves the order of the events which the concurrent handlers may complete in any order
+        :param handler_timeout: The maximum duration in seconds of an on_publish handler, a sync handler which
+            times out keeps running in its thread but isn't awaited anymore
+        :param max_workers: The number of threads running the sync on_publish handlers
+        """
         self.event_handlers = defaultdict(list)
+        # handlers of each dispatched event type resolved across its MRO, split into (sync, on_publish)
+        self._dispatch_table: Dict[type, Tuple[Tuple[EventHandler, ...], Tuple[EventHandler, ...]]] = {}
+        self.max_concurrency = max_concurrency
+        self.handler_timeout = handler_timeout
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
 
     def subscribe(self, event_type_list, func: Callable, on_publish=False):
         """
@@ -86,6 +149,7 @@ class LocalEventBus(EventBus):
         event_type_list = event_type_list if isinstance(event_type_list, (List, Tuple)) else [event_type_list]
         for event in event_type_list:
             self.event_handlers[event].append(EventHandler(func, on_publish=on_publish))
+        self._dispatch_table.clear()
 
     def unsubscribe(self, event_type, func: Callable):
         """
@@ -95,6 +159,30 @@ class LocalEventBus(EventBus):
         :param func: The event handler function to be unregistered.
         """
         self.event_handlers[event_type] = [handler for handler in self.event_handlers[event_type] if handler.func != func]
+        self._dispatch_table.clear()
+
+    def _dispatch(self, event_type) -> Tuple[Tuple[EventHandler, ...], Tuple[EventHandler, ...]]:
+        handlers = self._dispatch_table.get(event_type)
+        return handlers if handlers is not None else self._resolve(event_type)
+
+    def _resolve(self, event_type) -> Tuple[Tuple[EventHandler, ...], Tuple[EventHandler, ...]]:
+        resolved = {}
+        # the handlers of the event type come first, then those of its parents
+        for cls in getattr(event_type, "__mro__", (event_type,)):
+            for handler in self.event_handlers.get(cls, ()):
+                resolved.setdefault((handler.func, handler.on_publish), handler)
+        handlers = (tuple(handler for handler in resolved.values() if not handler.on_publish),
+                    tuple(handler for handler in resolved.values() if handler.on_publish))
+        self._dispatch_table[event_type] = handlers
+        return handlers
+
+    def publish_handlers(self, event_type) -> Tuple[EventHandler, ...]:
+        """
+        Return the on_publish handlers of an event type, including the handlers of its parent classes.
+
+        :param event_type: The event type
+        """
+        return self._dispatch(event_type)[1]
 
     def handler(self, *events, on_publish=False):
         """
@@ -116,33 +204,134 @@ class LocalEventBus(EventBus):
 
         return decorate
 
+    def batch_handler(self, *events, max_batch: Optional[int] = None, key: Optional[Callable] = None):
+        """
+        Decorator that adds a handler called on publish with the list of the published events of the given
+        types, instead of once per event.
+
+        **Example**:
+
+        >>> @event_bus.batch_handler(EmailChanged, max_batch=500, key=lambda e: e.user_id)
+        ... async def index_users(events: List[EmailChanged]):
+        ...     await search.index([e.user_id for e in events])
+
+        :param *events: The events to listen on.
+        :param max_batch: The maximum number of events of a call, the events are split in several calls beyond.
+        :param key: A function which returns the key of an event, only the latest event of each key is handled.
+        :returns: The decorated function.
+        """
+
+        def decorate(fun: Callable):
+            # a single handler for all the types, so that their events are handled in the same batches
+            batch_handler = BatchEventHandler(fun, max_batch=max_batch, key=key)
+            for event in events:
+                self.event_handlers[event].append(batch_handler)
+            self._dispatch_table.clear()
+            return fun
+
+        return decorate
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="event-bus")
+        return self._executor
+
+    def shutdown(self, wait=True):
+        """
+        Shutdown the thread pool of the sync handlers.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
     async def async_handle_events(self, events: Iterable):
         """
         Asynchronously handle a batch of events.
 
         This method processes the events using their respective event handlers.
-        Coroutine handlers are awaited,
+        Coroutine handlers are awaited, at most max_concurrency at once. Sync handlers run one after another
+        in the thread pool of the bus, since they share the context, and the session, of the publish.
+        The batch handlers are called with the list of their events.
+        A handler which fails or times out is logged without interrupting the others, the failures are then
+        raised together.
 
         :param events: The batch of events to handle.
+        :raises EventHandlingError: If some handlers failed or timed out
         """
-        logger.debug(f"local event bus call with {events}")
-        coroutines = []
+        logger.debug("local event bus call with %s", events)
+        jobs = []
+        batched = defaultdict(list)
         for event in events:
-            for handler in self.event_handlers.get(type(event), []):
-                if handler.on_publish:
-                    coroutines.append(handler.async_handle(event))
-        await asyncio.gather(*coroutines)
+            for handler in self._dispatch(type(event))[1]:
+                if isinstance(handler, BatchEventHandler):
+                    batched[handler].append(event)
+                else:
+                    jobs.append((handler, event))
+        for handler, handler_events in batched.items():
+            jobs.extend((handler, batch) for batch in handler.batches(handler_events))
+        sync_jobs = [job for job in jobs if not inspect.iscoroutinefunction(job[0].func)]
+        async_jobs = iter([job for job in jobs if inspect.iscoroutinefunction(job[0].func)])
+        failures: List[Tuple[EventHandler, object, BaseException]] = []
+
+        async def worker():
+            # the workers share the iterator, so that only max_concurrency coroutines are created
+            for handler, event in async_jobs:
+                await self._run_handler(handler, event, failures)
+
+        async def run_sync_handlers():
+            for handler, event in sync_jobs:
+                await self._run_handler(handler, event, failures)
+        await asyncio.gather(run_sync_handlers(),
+                             *[worker() for _ in range(min(self.max_concurrency, len(jobs) - len(sync_jobs)))])
+        if failures:
+            raise EventHandlingError(failures)
+
+    async def _run_handler(self, handler: EventHandler, event, failures: List):
+        start, error = time.perf_counter(), None
+        try:
+            await asyncio.wait_for(handler.async_handle(event, executor=self.executor), self.handler_timeout)
+        except asyncio.TimeoutError as e:
+            error = e
+            logger.error("Handler %s timed out after %ss on %s", _handler_name(handler), self.handler_timeout, event)
+        except Exception as e:
+            error = e
+            logger.exception("Handler %s failed on %s", _handler_name(handler), event)
+        if error is not None:
+            failures.append((handler, event, error))
+        if metrics_hooks:
+            # the event of a batch handler is the list of its events
+            event_type = type(event[0]) if isinstance(handler, BatchEventHandler) else type(event)
+            _report_handler(handler, event_type, time.perf_counter() - start, error)
 
     def handle_event(self, event):
         """
         Handle a single event.
 
-        This method invokes the event handlers for the given event type.
+        This method invokes the event handlers for the given event type and its parent classes.
 
         :param event: The event to handle.
         """
-        for handler in self.event_handlers[type(event)]:
-            if not handler.on_publish:
+        handlers = self._dispatch(type(event))
+        if not metrics_hooks:
+            for handler in handlers[0]:
+                handler.handle(event)
+            return
+        for handler in handlers[0]:
+            start = time.perf_counter()
+            try:
                 handler.handle(event)
+            except Exception as e:
+                _report_handler(handler, type(event), time.perf_counter() - start, e)
+                raise
+            _report_handler(handler, type(event), time.perf_counter() - start, None)
+
+
+def _handler_name(handler: EventHandler) -> str:
+    return getattr(handler.func, "__qualname__", None) or repr(handler.func)
 
 
+def _report_handler(handler: EventHandler, event_type: type, duration: float, error: Optional[BaseException]):
+    name = _handler_name(handler)
+    for metrics in metrics_hooks:
+        metrics.on_handler(name, event_type, duration, error)
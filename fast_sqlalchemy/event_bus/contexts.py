@@ -2,6 +2,7 @@ import contextlib, logging
 from contextvars import ContextVar
 from typing import Set
 from fast_sqlalchemy.event_bus.bus import EventBus
+from fast_sqlalchemy.event_bus.metrics import metrics_hooks
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +19,8 @@ def event_queue_ctx():
         yield
     finally:
         logger.debug("event queue reset")
+        for metrics in metrics_hooks:
+            metrics.on_request_events(len(_event_queue.get()))
         _event_queue.reset(token)
 
 
@@ -0,0 +1,117 @@
+import asyncio, logging
+from typing import Awaitable, Callable, List, Optional
+
+from fast_sqlalchemy.event_bus.bus import EventHandlingError
+from fast_sqlalchemy.event_bus.emit import handle_events
+
+logger = logging.getLogger(__name__)
+
+
+class EventDispatcher:
+    """
+    Handle the published events out of the request: the events are put in a bounded queue drained by
+    worker tasks, so that the response doesn't wait for the async handlers.
+    Start the dispatcher with the application and stop it on shutdown to drain the queue.
+
+    **Example**:
+
+    >>> dispatcher = EventDispatcher(workers=4, max_size=1000)
+    >>> fastapi.add_middleware(EventBusMiddleware, buses=[event_bus], dispatcher=dispatcher)
+    >>> fastapi.add_event_handler("startup", dispatcher.start)
+    >>> fastapi.add_event_handler("shutdown", dispatcher.stop)
+
+    :param workers: The number of worker tasks
+    :param max_size: The maximum number of queued batches of events, a request which publishes events
+        waits for a free slot once the queue is full
+    :param on_dispatched: A coroutine function called with the events once all their handlers succeeded, for
+        instance to acknowledge them in a persistent store which redelivers the unacknowledged events, so that
+        every event is handled at least once
+    """
+
+    def __init__(self, workers=4, max_size=1000, on_dispatched: Optional[Callable[[List], Awaitable[None]]] = None):
+        self.workers = workers
+        self.max_size = max_size
+        self.on_dispatched = on_dispatched
+        self.high_water_mark = 0
+        self.submitted = 0
+        self.dispatched = 0
+        self.failed = 0
+        self.waits = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        """
+        Start the worker tasks in the running event loop.
+        """
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: Optional[float] = None):
+        """
+        Wait for the queued events to be handled, then stop the worker tasks.
+
+        :param timeout: The maximum duration of the drain in seconds, the events still queued are then dropped
+        """
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"{self._queue.qsize()} batches of events dropped, the drain timed out")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, events: List):
+        """
+        Queue a batch of events, the dispatcher is started if it isn't running yet.
+        Wait for a free slot when the queue is full.
+
+        :param events: The events to handle
+        """
+        if not events:
+            return
+        if not self.running:
+            await self.start()
+        if self._queue.full():
+            self.waits += 1
+        await self._queue.put(list(events))
+        self.submitted += 1
+        self.high_water_mark = max(self.high_water_mark, self._queue.qsize())
+
+    async def _worker(self):
+        while True:
+            events = await self._queue.get()
+            try:
+                await handle_events(events)
+                if self.on_dispatched is not None:
+                    await self.on_dispatched(events)
+                self.dispatched += 1
+            except EventHandlingError as e:
+                # the events aren't acknowledged, the failed handlers are logged by the event bus
+                self.failed += 1
+                logger.error("Dispatch of %s failed: %s", events, e)
+            except Exception:
+                self.failed += 1
+                logger.exception(f"Dispatch of {events} failed")
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            "size": self._queue.qsize() if self._queue is not None else 0,
+            "max_size": self.max_size,
+            "high_water_mark": self.high_water_mark,
+            "submitted": self.submitted,
+            "dispatched": self.dispatched,
+            "failed": self.failed,
+            "waits": self.waits,
+        }
@@ -1,7 +1,9 @@
 import asyncio
 import logging
+from collections import Counter
 
 from fast_sqlalchemy.event_bus.contexts import _event_queue, event_bus_store
+from fast_sqlalchemy.event_bus.metrics import metrics_hooks
 
 logger = logging.getLogger(__name__)
 
@@ -13,9 +15,11 @@ def emit(event):
 
     :param event: Event object to emit
     """
-    logger.debug(f"emit {event}")
+    logger.debug("emit %s", event)
     queue = _event_queue.get()
     queue.append(event)
+    for metrics in metrics_hooks:
+        metrics.on_emit(type(event))
     for event_bus in event_bus_store:
         event_bus.handle_event(event)
 
@@ -27,6 +31,18 @@ async def publish_events():
     This reset the queue of events.
     """
     logger.debug("publishing events")
-    events = _event_queue.get()
+    await handle_events(_event_queue.get())
+
+async def handle_events(events):
+    """
+    Call the async handlers of all the event buses for a batch of events.
+    The requests, the dispatcher and the scheduler publish their events through it.
+
+    :param events: The events to handle
+    """
+    if metrics_hooks:
+        for event_type, count in Counter(map(type, events)).items():
+            for metrics in metrics_hooks:
+                metrics.on_publish(event_type, count)
     await asyncio.gather(*[event_bus.async_handle_events(events) for
                            event_bus in event_bus_store])
@@ -0,0 +1,139 @@
+import asyncio, logging, os, pickle
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from fast_sqlalchemy.event_bus.bus import EventBus, EventHandlingError, LocalEventBus
+
+logger = logging.getLogger(__name__)
+
+HEADER_SIZE = 4
+
+
+def _dumps(events: List) -> bytes:
+    return pickle.dumps(events, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+class IPCEventBus(EventBus):
+    """
+    Event bus which broadcasts the published events to the sibling worker processes of the same host.
+    Each process listens on a unix socket in a shared directory and sends each publish as one length prefixed
+    frame to the sockets of the other processes, which call the on_publish handlers of their local bus.
+    The sync handlers of the local bus are only called in the emitting process.
+    The directory is only accessible to its owner, the events are unpickled by default.
+
+    **Example**:
+
+    >>> ipc_bus = IPCEventBus(local_event_bus, "/run/my_app/events")
+    >>> fastapi.add_middleware(EventBusMiddleware, buses=[ipc_bus])
+    >>> fastapi.add_event_handler("startup", ipc_bus.start)
+    >>> fastapi.add_event_handler("shutdown", ipc_bus.stop)
+
+    :param bus: The local event bus which holds the handlers
+    :param directory: The directory of the sockets of the processes
+    :param serializer: Serialize a list of events to bytes, pickle by default
+    :param deserializer: Deserialize a list of events from bytes
+    :param name: The name of the socket of this process, defaults to the pid
+    """
+
+    def __init__(self, bus: LocalEventBus, directory: str, serializer: Callable[[List], bytes] = _dumps,
+                 deserializer: Callable[[bytes], Any] = pickle.loads, name: Optional[str] = None):
+        self.bus = bus
+        self.directory = directory
+        self.name = name
+        self.serializer = serializer
+        self.deserializer = deserializer
+        self.path: Optional[str] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers: Dict[str, asyncio.StreamWriter] = {}
+        # the connections of the other processes and the tasks which read them
+        self._receivers: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+
+    async def start(self):
+        """
+        Listen for the events of the other processes.
+        """
+        if self._server is not None:
+            return
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        self.path = os.path.join(self.directory, f"{self.name or os.getpid()}.sock")
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._server = await asyncio.start_unix_server(self._receive, path=self.path)
+
+    async def stop(self):
+        """
+        Stop listening and close the connections to the other processes.
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+            os.remove(self.path)
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+        for writer in self._receivers.values():
+            writer.close()
+        await asyncio.gather(*self._receivers, return_exceptions=True)
+
+    def handle_event(self, event):
+        self.bus.handle_event(event)
+
+    async def async_handle_events(self, events: Iterable):
+        """
+        Handle the events in this process and send them in a single frame to the other processes.
+
+        :param events: The batch of events to handle.
+        """
+        events = [event for event in events if self.bus.publish_handlers(type(event))]
+        if not events:
+            return
+        payload = self.serializer(events)
+        frame = len(payload).to_bytes(HEADER_SIZE, "big") + payload
+        await asyncio.gather(self.bus.async_handle_events(events),
+                             *[self._send(peer, frame) for peer in self._peers()])
+
+    def _peers(self) -> List[str]:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return [path for name in names if name.endswith(".sock")
+                and (path := os.path.join(self.directory, name)) != self.path]
+
+    async def _send(self, peer: str, frame: bytes):
+        try:
+            writer = self._writers.get(peer)
+            if writer is None:
+                _, writer = await asyncio.open_unix_connection(peer)
+                if peer in self._writers:
+                    # opened concurrently by another publish
+                    writer.close()
+                writer = self._writers.setdefault(peer, writer)
+            writer.write(frame)
+            await writer.drain()
+        except (ConnectionError, FileNotFoundError) as e:
+            # the process of the socket stopped, its socket is ignored until it's replaced
+            logger.debug(f"Unable to send events to {peer}: {e}")
+            writer = self._writers.pop(peer, None)
+            if writer is not None:
+                writer.close()
+
+    async def _receive(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._receivers[task] = writer
+        try:
+            while True:
+                header = await reader.readexactly(HEADER_SIZE)
+                payload = await reader.readexactly(int.from_bytes(header, "big"))
+                try:
+                    await self.bus.async_handle_events(self.deserializer(payload))
+                except EventHandlingError:
+                    # the failed handlers are logged, the next frames are still handled
+                    pass
+        except asyncio.IncompleteReadError:
+            pass
+        except Exception:
+            logger.exception("Unable to receive events")
+        finally:
+            self._receivers.pop(task, None)
+            writer.close()
@@ -0,0 +1,101 @@
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Sequence
+
+from fast_sqlalchemy.histogram import Histogram
+
+HANDLER_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+
+class EventBusMetrics:
+    """
+    Hooks called by the event bus, subclass it to export the metrics to your own metrics system and register
+    it with add_metrics. The hooks must be cheap, they are called on every emit and every handler call.
+    """
+
+    def on_emit(self, event_type: type):
+        """
+        Called when an event is emitted.
+        """
+
+    def on_publish(self, event_type: type, count: int):
+        """
+        Called when a batch of events is published, by a request, the dispatcher or the scheduler, once per
+        event type.
+        """
+
+    def on_handler(self, handler_name: str, event_type: type, duration: float, error: Optional[BaseException]):
+        """
+        Called once a handler has run, error is the raised exception or asyncio.TimeoutError
+        if the handler timed out.
+        """
+
+    def on_request_events(self, count: int):
+        """
+        Called at the end of an event queue context with the number of emitted events.
+        """
+
+
+# the registered metrics, the event bus skips the hooks when it's empty
+metrics_hooks: List[EventBusMetrics] = []
+
+
+def add_metrics(metrics: EventBusMetrics):
+    metrics_hooks.append(metrics)
+
+
+def remove_metrics(metrics: EventBusMetrics):
+    metrics_hooks.remove(metrics)
+
+
+def event_type_name(event_type: type) -> str:
+    return getattr(event_type, "__qualname__", None) or str(event_type)
+
+
+class MemoryMetrics(EventBusMetrics):
+    def __init__(self, buckets: Sequence[float] = HANDLER_BUCKETS):
+        """
+        Event bus metrics kept in memory: emitted and published events per type, handler calls, errors
+        and duration histograms and the maximum number of events of a request.
+
+        :param buckets: The buckets of the handler duration histograms in seconds
+        """
+        self.buckets = buckets
+        self.emitted: Counter[str] = Counter()
+        self.published: Counter[str] = Counter()
+        self.handler_calls: Counter[str] = Counter()
+        self.handler_errors: Counter[str] = Counter()
+        self.handler_durations: Dict[str, Histogram] = defaultdict(lambda: Histogram(self.buckets))
+        self.max_request_events = 0
+        self._lock = threading.Lock()
+
+    def on_emit(self, event_type: type):
+        with self._lock:
+            self.emitted[event_type_name(event_type)] += 1
+
+    def on_publish(self, event_type: type, count: int):
+        with self._lock:
+            self.published[event_type_name(event_type)] += count
+
+    def on_handler(self, handler_name: str, event_type: type, duration: float, error: Optional[BaseException]):
+        with self._lock:
+            self.handler_calls[handler_name] += 1
+            if error is not None:
+                self.handler_errors[handler_name] += 1
+            self.handler_durations[handler_name].observe(duration)
+
+    def on_request_events(self, count: int):
+        with self._lock:
+            self.max_request_events = max(self.max_request_events, count)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "emitted": dict(self.emitted),
+                "published": dict(self.published),
+                "handlers": {name: {"calls": calls, "errors": self.handler_errors[name],
+                                    "duration": {"buckets": self.handler_durations[name].cumulative_counts(),
+                                                 "sum": self.handler_durations[name].sum}}
+                             for name, calls in self.handler_calls.items()},
+                "max_request_events": self.max_request_events,
+            }
@@ -1,16 +1,24 @@
-from typing import Iterable
+from typing import Iterable, Optional
 
 from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
 from starlette.requests import Request
 from starlette.types import ASGIApp
 
-from fast_sqlalchemy.event_bus.contexts import event_queue_ctx, event_bus_store
+from fast_sqlalchemy.event_bus.bus import EventHandlingError
+from fast_sqlalchemy.event_bus.contexts import event_queue_ctx, event_bus_store, _event_queue
+from fast_sqlalchemy.event_bus.dispatcher import EventDispatcher
 from fast_sqlalchemy.event_bus.emit import publish_events
 
 
 class EventBusMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app: ASGIApp, buses: Iterable):
+    def __init__(self, app: ASGIApp, buses: Iterable, dispatcher: Optional[EventDispatcher] = None):
+        """
+        :param buses: The event buses
+        :param dispatcher: Handle the published events out of the request with this dispatcher instead of
+            before the response is returned
+        """
         super().__init__(app)
+        self.dispatcher = dispatcher
         self.register_buses(buses=buses)
 
     def register_buses(self, buses: Iterable):
@@ -20,6 +28,13 @@ class EventBusMiddleware(BaseHTTPMiddleware):
         with event_queue_ctx():
             response = await call_next(request)
             if response.status_code < 400:
-                await publish_events()
+                if self.dispatcher is not None:
+                    await self.dispatcher.submit(_event_queue.get())
+                else:
+                    try:
+                        await publish_events()
+                    except EventHandlingError:
+                        # the failed handlers are logged, they don't fail the request
+                        pass
         return response
 
@@ -0,0 +1,177 @@
+import asyncio, functools, logging, pickle
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Iterable, List, Optional
+
+from sqlalchemy import Table, MetaData, Column, Integer, String, LargeBinary, DateTime, insert, select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+
+from fast_sqlalchemy.event_bus.bus import EventBus, EventHandlingError, LocalEventBus
+from fast_sqlalchemy.persistence.database import Database
+
+logger = logging.getLogger(__name__)
+
+
+def outbox_table(metadata: MetaData, name="event_outbox") -> Table:
+    """
+    Create the table which stores the events of an OutboxEventBus.
+    """
+    return Table(name, metadata,
+                 Column("id", Integer, primary_key=True),
+                 Column("event_type", String(255), nullable=False),
+                 Column("payload", LargeBinary, nullable=False),
+                 Column("created_at", DateTime, nullable=False),
+                 Column("attempts", Integer, nullable=False, default=0),
+                 Column("processed_at", DateTime, index=True))
+
+
+class OutboxEventBus(EventBus):
+    """
+    Event bus which stores the events in an outbox table with the session of the current context, so that
+    they are committed with the transaction which emitted them. The sync handlers of the local bus are called
+    on emit, its on_publish handlers are called by the relay once the events are committed.
+
+    **Example**:
+
+    >>> outbox = OutboxEventBus(db, outbox_table(Base.metadata), local_event_bus)
+    >>> relay = outbox.relay(batch_size=100)
+    >>> fastapi.add_middleware(EventBusMiddleware, buses=[outbox])
+    >>> fastapi.add_event_handler("startup", relay.start)
+    >>> fastapi.add_event_handler("shutdown", relay.stop)
+
+    :param db: The database object
+    :param table: The outbox table, see outbox_table
+    :param bus: The local event bus which holds the handlers
+    :param serializer: Serialize an event to bytes, pickle by default
+    :param deserializer: Deserialize an event from bytes
+    """
+
+    def __init__(self, db: Database, table: Table, bus: LocalEventBus, serializer: Callable[[Any], bytes] = pickle.dumps,
+                 deserializer: Callable[[bytes], Any] = pickle.loads):
+        self.db = db
+        self.table = table
+        self.bus = bus
+        self.serializer = serializer
+        self.deserializer = deserializer
+
+    def handle_event(self, event):
+        """
+        Call the sync handlers of the local bus and store the event if it has on_publish handlers.
+
+        :param event: The event to handle.
+        """
+        self.bus.handle_event(event)
+        if self.bus.publish_handlers(type(event)):
+            self.db.session.execute(insert(self.table).values(
+                event_type=f"{type(event).__module__}.{type(event).__qualname__}",
+                payload=self.serializer(event), created_at=datetime.utcnow(), attempts=0))
+
+    async def async_handle_events(self, events: Iterable):
+        """
+        The stored events are handled by the relay once committed.
+        """
+
+    def relay(self, batch_size=100, poll_interval=1.0, max_attempts=5) -> "OutboxRelay":
+        return OutboxRelay(self, batch_size=batch_size, poll_interval=poll_interval, max_attempts=max_attempts)
+
+
+class OutboxRelay:
+    def __init__(self, outbox: OutboxEventBus, batch_size=100, poll_interval=1.0, max_attempts=5):
+        """
+        Poll the outbox table by batches, call the on_publish handlers of the local bus and mark the events
+        as processed in the same transaction. An event is handled at least once: a relay which dies before its
+        commit leaves the events to the next poll.
+        The batch is selected with FOR UPDATE SKIP LOCKED, so that concurrent relays don't handle the same
+        events. SQLite has no row locks, run a single relay on SQLite.
+        The queries run on a dedicated thread and an event which has a failed handler is left in the outbox
+        for the next polls.
+
+        :param outbox: The outbox event bus
+        :param batch_size: The maximum number of events handled at once
+        :param poll_interval: The delay in seconds between two polls once the outbox is empty
+        :param max_attempts: The number of attempts after which an event which fails to be handled is left in
+            the outbox
+        """
+        self.outbox = outbox
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self._task: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="outbox-relay")
+        return self._executor
+
+    async def relay_batch(self) -> int:
+        """
+        Handle a batch of events, return the number of events of the batch.
+        The queries run on the thread of the relay, so that they don't block the event loop.
+        """
+        db = self.outbox.db
+        run = functools.partial(asyncio.get_running_loop().run_in_executor, self.executor)
+        with db.session_ctx() as session:
+            try:
+                rows = await run(self._claim_batch, session)
+                if not rows:
+                    return 0
+                ids = [row.id for row in rows]
+                try:
+                    events: List = [self.outbox.deserializer(row.payload) for row in rows]
+                    await self.outbox.bus.async_handle_events(events)
+                except EventHandlingError as e:
+                    logger.error("Relay of the outbox events %s failed: %s", ids, e)
+                except Exception:
+                    logger.exception("Relay of the outbox events %s failed", ids)
+                else:
+                    await run(self._mark_processed, session, ids)
+                await run(session.commit)
+                return len(rows)
+            finally:
+                await run(session.close)
+
+    def _claim_batch(self, session: Session) -> List[Row]:
+        table = self.outbox.table
+        rows = session.execute(
+            select(table.c.id, table.c.payload)
+            .where(table.c.processed_at.is_(None), table.c.attempts < self.max_attempts)
+            .order_by(table.c.id).limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if rows:
+            session.execute(update(table).where(table.c.id.in_([row.id for row in rows]))
+                            .values(attempts=table.c.attempts + 1))
+        return rows
+
+    def _mark_processed(self, session: Session, ids: List[int]):
+        table = self.outbox.table
+        session.execute(update(table).where(table.c.id.in_(ids)).values(processed_at=datetime.utcnow()))
+
+    async def run(self):
+        """
+        Relay the events until the relay is stopped.
+        """
+        while True:
+            try:
+                relayed = await self.relay_batch()
+            except Exception:
+                logger.exception("Poll of the outbox failed")
+                relayed = 0
+            if relayed < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -0,0 +1,180 @@
+import asyncio, heapq, itertools, logging, threading
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+
+from fast_sqlalchemy.event_bus.bus import EventHandlingError
+from fast_sqlalchemy.event_bus.emit import handle_events
+
+logger = logging.getLogger(__name__)
+
+
+class _Timer:
+    __slots__ = ("event", "dedupe_key", "active")
+
+    def __init__(self, event, dedupe_key: Optional[Hashable]):
+        self.event = event
+        self.dedupe_key = dedupe_key
+        self.active = True
+
+
+class EventScheduler:
+    """
+    Publish events after a delay through the async handlers of the registered event buses.
+    The timers are kept in a heap and a single task sleeps until the next deadline, so that pending timers
+    cost nothing while they wait. A timer with the dedupe key of a pending timer replaces it, the superseded
+    timer is only flagged as cancelled and dropped once it reaches the top of the heap.
+    The events can be scheduled from any thread, the handlers run on the event loop of the scheduler.
+
+    :param compact_ratio: Rebuild the heap once the cancelled timers exceed this ratio of the heap
+    """
+
+    def __init__(self, compact_ratio=0.5):
+        self.compact_ratio = compact_ratio
+        self._heap: List[Tuple[float, int, _Timer]] = []
+        self._keys: Dict[Hashable, _Timer] = {}
+        self._cancelled = 0
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._handling: Set[asyncio.Task] = set()
+
+    def __len__(self):
+        return len(self._heap) - self._cancelled
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self):
+        """
+        Start the scheduler on the running event loop.
+        """
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop the scheduler, the pending timers are dropped.
+        """
+        if not self.running:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, *self._handling, return_exceptions=True)
+        self._task = None
+        with self._lock:
+            if len(self):
+                logger.warning("%s scheduled events dropped", len(self))
+            self._heap.clear()
+            self._keys.clear()
+            self._cancelled = 0
+
+    def schedule(self, event: Any, delay: float, dedupe_key: Optional[Hashable] = None):
+        """
+        Publish an event after delay seconds.
+
+        :param event: The event to publish
+        :param delay: The delay in seconds
+        :param dedupe_key: Replace the pending timer with the same key
+        """
+        if not self.running:
+            raise RuntimeError("The event scheduler isn't started")
+        timer = _Timer(event, dedupe_key)
+        with self._lock:
+            if dedupe_key is not None:
+                self._cancel(self._keys.get(dedupe_key))
+                self._keys[dedupe_key] = timer
+            deadline = self._loop.time() + delay
+            heapq.heappush(self._heap, (deadline, next(self._counter), timer))
+            is_next = self._heap[0][2] is timer
+        if is_next:
+            self._notify()
+
+    def cancel(self, dedupe_key: Hashable) -> bool:
+        """
+        Cancel the pending timer of a dedupe key, return whether there was one.
+        """
+        with self._lock:
+            return self._cancel(self._keys.pop(dedupe_key, None))
+
+    def _cancel(self, timer: Optional[_Timer]) -> bool:
+        if timer is None or not timer.active:
+            return False
+        timer.active = False
+        self._cancelled += 1
+        if self._cancelled > len(self._heap) * self.compact_ratio:
+            self._heap = [item for item in self._heap if item[2].active]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+        return True
+
+    def _notify(self):
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._loop:
+            self._wakeup.set()
+        else:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _pop_due(self) -> Tuple[List, Optional[float]]:
+        # return the events which are due and the delay until the next timer
+        with self._lock:
+            now = self._loop.time()
+            due = []
+            while self._heap and (self._heap[0][0] <= now or not self._heap[0][2].active):
+                _, _, timer = heapq.heappop(self._heap)
+                if not timer.active:
+                    self._cancelled -= 1
+                    continue
+                due.append(timer.event)
+                if timer.dedupe_key is not None and self._keys.get(timer.dedupe_key) is timer:
+                    del self._keys[timer.dedupe_key]
+            return due, self._heap[0][0] - now if self._heap else None
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            due, timeout = self._pop_due()
+            if due:
+                task = asyncio.create_task(self._handle(due))
+                self._handling.add(task)
+                task.add_done_callback(self._handling.discard)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _handle(self, events: List):
+        try:
+            await handle_events(events)
+        except EventHandlingError:
+            # the failed handlers are logged by the event bus
+            pass
+        except Exception:
+            logger.exception("Publication of the scheduled events %s failed", events)
+
+
+scheduler = EventScheduler()
+
+
+def emit_later(event: Any, delay: float, dedupe_key: Optional[Hashable] = None):
+    """
+    Publish an event after a delay with the default scheduler, which must be started with the application.
+    An event emitted with the dedupe key of a pending event replaces it, the delay starts again.
+
+    **Example**:
+
+    >>> fastapi.add_event_handler("startup", scheduler.start)
+    >>> fastapi.add_event_handler("shutdown", scheduler.stop)
+    >>> emit_later(ReindexUser(user.id), delay=30, dedupe_key=("reindex", user.id))
+
+    :param event: The event to publish
+    :param delay: The delay in seconds
+    :param dedupe_key: Replace the pending event with the same key
+    """
+    scheduler.schedule(event, delay, dedupe_key=dedupe_key)
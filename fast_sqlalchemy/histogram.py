@@ -0,0 +1,30 @@
+import bisect
+from typing import Dict, Sequence
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    """
+    Cumulative histogram of durations in seconds, buckets follow the Prometheus conventions.
+
+    :param buckets: The upper bounds of the buckets, a last bucket +Inf is always added
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self) -> Dict[str, int]:
+        counts, total = {}, 0
+        for bound, count in zip((*self.buckets, float("inf")), self.counts):
+            total += count
+            counts["+Inf" if bound == float("inf") else str(bound)] = total
+        return counts
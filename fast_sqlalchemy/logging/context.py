@@ -0,0 +1,4 @@
+from contextvars import ContextVar
+from typing import Optional
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
@@ -1,5 +1,17 @@
+import json
 import logging
+import time
 from copy import copy
+from operator import attrgetter
+from typing import Any, Callable, List, Mapping, Optional, Sequence, Tuple
+
+from fast_sqlalchemy.logging.context import _request_id
+from fast_sqlalchemy.persistence.context import _query_stats, _route, _tenant
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 class ColorFormatter(logging.Formatter):
     green = "\x1b[0;32m"
@@ -29,3 +41,84 @@ class ColorFormatter(logging.Formatter):
         level_color = self.FORMATS.get(colored_record.levelno)
         colored_record.levelname = f"{level_color} {colored_record.levelname}{self.default}"
         return super().format(colored_record)
+
+
+_json_dumps: Callable[[dict], str] = json.JSONEncoder(default=str, separators=(",", ":"), ensure_ascii=False).encode
+
+
+def _orjson_dumps(data: dict) -> str:
+    return orjson.dumps(data, default=str).decode()
+
+
+DEFAULT_FIELDS = {"time": "asctime", "level": "levelname", "logger": "name", "message": "message"}
+
+
+class JSONFormatter(logging.Formatter):
+    def __init__(self, fields: Mapping[str, str] = DEFAULT_FIELDS, extras: Sequence[str] = (), datefmt=None,
+                 context=True, dumps: Optional[Callable[[dict], str]] = None):
+        """
+        Format the records as a single line of JSON, for log shipping. The record isn't copied, the getters
+        of the fields are built once. The request id, route, tenant and SQL query count and time of the current
+        request are added when they're known, the SQL stats require profile_queries=True.
+
+        :param fields: The keys of the JSON object and the record attributes of their value, 'message' and
+            'asctime' are the formatted message and time
+        :param extras: Record attributes, like the extra of the log calls, added when they're set
+        :param datefmt: The strftime format of the time, ISO 8601 in UTC by default
+        :param context: Add the fields of the request context
+        :param dumps: Serialize the object to a string, orjson when it's installed, json otherwise
+        """
+        super().__init__(datefmt=datefmt)
+        self.getters: List[Tuple[str, Callable[[logging.LogRecord], Any]]] = [
+            (key, self._getter(attribute)) for key, attribute in fields.items()]
+        self.extras = tuple(extras)
+        self.context = context
+        self.dumps = dumps or (_orjson_dumps if orjson is not None else _json_dumps)
+        self._date: Tuple[Optional[int], str] = (None, "")
+
+    def _getter(self, attribute: str) -> Callable[[logging.LogRecord], Any]:
+        if attribute == "message":
+            return logging.LogRecord.getMessage
+        if attribute == "asctime":
+            return self.formatTime
+        return attrgetter(attribute)
+
+    def formatTime(self, record, datefmt=None):
+        if self.datefmt is None:
+            # the records of the same second share the formatted date
+            second = int(record.created)
+            cached_second, date = self._date
+            if second != cached_second:
+                date = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+                self._date = (second, date)
+            return f"{date}.{int(record.msecs):03d}+00:00"
+        return super().formatTime(record, self.datefmt)
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {key: getter(record) for key, getter in self.getters}
+        if self.context:
+            self._add_context(data)
+        for attribute in self.extras:
+            value = getattr(record, attribute, None)
+            if value is not None:
+                data[attribute] = value
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+            data["exc_info"] = record.exc_text
+        if record.stack_info:
+            data["stack_info"] = self.formatStack(record.stack_info)
+        return self.dumps(data)
+
+    @staticmethod
+    def _add_context(data: dict):
+        request_id, route, tenant, stats = _request_id.get(), _route.get(), _tenant.get(), _query_stats.get()
+        if request_id is not None:
+            data["request_id"] = request_id
+        if route is not None:
+            data["route"] = route
+        if tenant is not None:
+            data["tenant"] = tenant
+        if stats is not None:
+            data["sql_queries"] = stats.count
+            data["sql_time_ms"] = round(stats.total_time * 1000, 2)
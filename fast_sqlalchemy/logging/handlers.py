@@ -1,9 +1,11 @@
+import queue, threading, time
 from logging import Handler, LogRecord
-from typing import Callable
+from typing import Callable, List, Optional, Tuple
 
 from sqlalchemy import insert, Table
 
 from fast_sqlalchemy.persistence.database import Database
+from fast_sqlalchemy.persistence.slow_queries import ignore_slow_queries
 
 
 class DatabaseHandler(Handler):
@@ -29,3 +31,94 @@ class DatabaseHandler(Handler):
                 self.db.session.commit()
         except Exception:
             self.handleError(record)
+
+
+_STOP = object()
+
+
+class QueuedDatabaseHandler(DatabaseHandler):
+    def __init__(self, db: Database, table: Table, mapping_logs: Callable[[LogRecord], dict[str, str]],
+                 batch_size=100, flush_interval=0.5, max_queue_size=10000, block=False):
+        """
+        Save log within the database's table from a background thread. emit only queues the mapped record,
+        the thread inserts the records by batches of batch_size or every flush_interval, in a single
+        executemany statement. The queued records are saved when the handler is closed.
+
+        :param db: The database object
+        :param table: The table which will contain the logs
+        :param mapping_logs: Map a record to the values of a row
+        :param batch_size: The maximum number of records inserted at once
+        :param flush_interval: The maximum delay in seconds before a queued record is inserted
+        :param max_queue_size: The maximum number of queued records
+        :param block: Whether emit waits for room in a full queue, otherwise the record is dropped
+        """
+        super().__init__(db, table, mapping_logs)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block = block
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(max_queue_size)
+        self._thread: Optional[threading.Thread] = threading.Thread(target=self._run, daemon=True,
+                                                                    name="QueuedDatabaseHandler")
+        self._thread.start()
+
+    def emit(self, record: LogRecord) -> None:
+        try:
+            self.format(record)
+            item = (record, self.mapping_logs(record))
+            if self.block:
+                self._queue.put(item)
+            else:
+                self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def flush(self) -> None:
+        """
+        Wait until the queued records are saved.
+        """
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        """
+        Save the queued records and stop the background thread.
+        """
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+        super().close()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while item is not _STOP and len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                batch.append(item)
+            records = [item for item in batch if item is not _STOP]
+            if records:
+                self._insert(records)
+            for _ in batch:
+                self._queue.task_done()
+            if batch[-1] is _STOP:
+                return
+
+    def _insert(self, records: List[Tuple[LogRecord, dict]]):
+        try:
+            # the inserts of the slow queries mustn't be logged as slow queries themselves
+            with ignore_slow_queries(), self.db.session_ctx():
+                self.db.session.execute(insert(self.table), [values for _, values in records])
+                self.db.session.commit()
+        except Exception:
+            self.handleError(records[0][0])
@@ -1,19 +1,37 @@
 import logging
 import time
+import uuid
 
 from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
 from starlette.requests import Request
 from starlette.responses import Response
+from starlette.types import ASGIApp
+
+from fast_sqlalchemy.logging.context import _request_id
 
 logger = logging.getLogger(__name__)
 
 
 class RequestLoggingMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app: ASGIApp, request_id_header="x-request-id"):
+        """
+        Log the method, status, path and duration of the requests. The request id is read from the
+        request_id_header or generated, and added to the records by the JSONFormatter.
+
+        :param app: The ASGI application
+        :param request_id_header: The header which holds the request id
+        """
+        super().__init__(app)
+        self.request_id_header = request_id_header
 
     async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        start = time.time()
-        response = await call_next(request)
-        end = time.time()
-        duration = "{:.2f}".format((end - start) * 1000)
-        logger.info(f"{request.method} {response.status_code} {request.url.path} {duration}ms ")
-        return response
+        token = _request_id.set(request.headers.get(self.request_id_header) or uuid.uuid4().hex)
+        try:
+            start = time.time()
+            response = await call_next(request)
+            end = time.time()
+            duration = "{:.2f}".format((end - start) * 1000)
+            logger.info(f"{request.method} {response.status_code} {request.url.path} {duration}ms ")
+            return response
+        finally:
+            _request_id.reset(token)
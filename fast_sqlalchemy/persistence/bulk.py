@@ -0,0 +1,115 @@
+import itertools
+from typing import Iterable, Iterator, List, Sequence, Optional
+
+from sqlalchemy import Table, insert, update, bindparam, and_
+from sqlalchemy.dialects import sqlite, postgresql, mysql
+from sqlalchemy.orm import Session
+
+UPSERT_DIALECTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+    "mysql": mysql.insert,
+    "mariadb": mysql.insert,
+}
+
+
+def get_table(table_or_model) -> Table:
+    return getattr(table_or_model, "__table__", table_or_model)
+
+
+def chunked(rows: Iterable[dict], batch_size: int) -> Iterator[List[dict]]:
+    """
+    Split the rows in lists of batch_size rows, the rows can be any iterable so that only one
+    batch is held in memory.
+    """
+    iterator = iter(rows)
+    while batch := list(itertools.islice(iterator, batch_size)):
+        yield batch
+
+
+def bulk_insert(session: Session, table_or_model, rows: Iterable[dict], batch_size=1000) -> int:
+    """
+    Insert the rows by batches with an executemany.
+
+    :param session: The session used to execute the statements
+    :param table_or_model: The table or the mapped class
+    :param rows: The rows to insert as dictionaries, it can be a generator
+    :param batch_size: The number of rows sent in each executemany
+    :return: The number of inserted rows
+    """
+    stmt = insert(get_table(table_or_model))
+    count = 0
+    for batch in chunked(rows, batch_size):
+        session.execute(stmt, batch)
+        count += len(batch)
+    return count
+
+
+def upsert_statement(dialect_name: str, table: Table, conflict_cols: Sequence[str], update_cols: Sequence[str]):
+    try:
+        dialect_insert = UPSERT_DIALECTS[dialect_name]
+    except KeyError:
+        raise NotImplementedError(f"Upsert is not supported by the dialect {dialect_name}")
+    stmt = dialect_insert(table)
+    if dialect_insert is mysql.insert:
+        return stmt.on_duplicate_key_update({col: stmt.inserted[col] for col in update_cols or conflict_cols})
+    if not update_cols:
+        return stmt.on_conflict_do_nothing(index_elements=conflict_cols)
+    return stmt.on_conflict_do_update(index_elements=conflict_cols,
+                                      set_={col: stmt.excluded[col] for col in update_cols})
+
+
+def bulk_upsert(session: Session, table_or_model, rows: Iterable[dict], conflict_cols: Sequence[str],
+                update_cols: Optional[Sequence[str]] = None, batch_size=1000) -> int:
+    """
+    Insert the rows by batches, the rows which conflict with an existing row are updated instead.
+    Supported by SQLite, PostgreSQL, MySQL and MariaDB.
+
+    :param session: The session used to execute the statements
+    :param table_or_model: The table or the mapped class
+    :param rows: The rows to upsert as dictionaries, it can be a generator
+    :param conflict_cols: The columns of the unique constraint or primary key which may conflict (ignored by MySQL
+        which uses every unique key)
+    :param update_cols: The columns updated on conflict, defaults to the columns of the first row which aren't
+        conflict columns
+    :param batch_size: The number of rows sent in each executemany
+    :return: The number of upserted rows
+    """
+    table = get_table(table_or_model)
+    dialect_name = session.get_bind().dialect.name
+    stmt = None
+    count = 0
+    for batch in chunked(rows, batch_size):
+        if stmt is None:
+            if update_cols is None:
+                update_cols = [col for col in batch[0] if col not in conflict_cols]
+            stmt = upsert_statement(dialect_name, table, conflict_cols, update_cols)
+        session.execute(stmt, batch)
+        count += len(batch)
+    return count
+
+
+def bulk_update(session: Session, table_or_model, rows: Iterable[dict], key_cols: Optional[Sequence[str]] = None,
+                batch_size=1000) -> int:
+    """
+    Update the rows by batches with an executemany, each row must contain the key columns.
+
+    :param session: The session used to execute the statements
+    :param table_or_model: The table or the mapped class
+    :param rows: The rows to update as dictionaries, it can be a generator
+    :param key_cols: The columns which identify the rows, defaults to the primary key
+    :param batch_size: The number of rows sent in each executemany
+    :return: The number of updated rows
+    """
+    table = get_table(table_or_model)
+    key_cols = key_cols or [col.name for col in table.primary_key.columns]
+    stmt = None
+    count = 0
+    for batch in chunked(rows, batch_size):
+        if stmt is None:
+            # the bound parameters can't have the name of the updated columns
+            stmt = update(table).where(and_(*[table.c[col] == bindparam(f"b_{col}") for col in key_cols])) \
+                .values({col: bindparam(f"b_{col}") for col in batch[0] if col not in key_cols})
+        result = session.execute(stmt, [{f"b_{col}": value for col, value in row.items()} for row in batch])
+        count += result.rowcount
+    return count
@@ -0,0 +1,297 @@
+from __future__ import annotations
+import pickle, threading, time
+from abc import ABC, abstractmethod
+from collections import defaultdict, OrderedDict
+from typing import Dict, Hashable, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import event, select, inspect
+from sqlalchemy.engine import FrozenResult, Result
+from sqlalchemy.orm import Session, ORMExecuteState, object_mapper, sessionmaker
+from sqlalchemy.orm.loading import merge_frozen_result
+from sqlalchemy.sql import Executable
+from sqlalchemy.sql.util import find_tables
+from sqlalchemy.util import LRUCache
+
+QUERY_CACHE_KEY = "query_cache"
+WRITTEN_TABLES_KEY = "written_tables"
+ALL_TABLES = "*"
+
+# Caches the sql string of the statements across the sessions
+_statement_cache = LRUCache(500)
+
+
+def statement_tables(statement) -> Set[str]:
+    """
+    Return the name of the tables used by a statement.
+    """
+    tables = set()
+    for table in find_tables(statement, check_columns=True, include_aliases=True, include_joins=True):
+        while hasattr(table, "element"):
+            table = table.element
+        if name := getattr(table, "name", None):
+            tables.add(name)
+    return tables
+
+
+def statement_key(orm_execute_state: ORMExecuteState) -> Optional[str]:
+    """
+    Return a key made of the compiled statement and its parameters or None if the statement can't be cached.
+    """
+    cache_key = orm_execute_state.statement._generate_cache_key()
+    if cache_key is None:
+        return None
+    return cache_key.to_offline_string(_statement_cache, orm_execute_state.statement,
+                                       orm_execute_state.parameters or {})
+
+
+def flushed_tables(session: Session) -> Set[str]:
+    """
+    Return the name of the tables written by the flush of a session.
+    """
+    return {table.name for obj in (*session.new, *session.dirty, *session.deleted)
+            for table in object_mapper(obj).tables}
+
+
+class QueryCache:
+    """
+    Cache of the results of the SELECT statements of a session, the results are stored by table
+    so that a write on a table only invalidates the results which use it.
+    """
+
+    def __init__(self):
+        self._results: Dict[Hashable, FrozenResult] = {}
+        self._keys_by_table: Dict[str, Set[Hashable]] = defaultdict(set)
+
+    def __len__(self):
+        return len(self._results)
+
+    def get(self, key: Hashable) -> Optional[FrozenResult]:
+        return self._results.get(key)
+
+    def set(self, key: Hashable, result: FrozenResult, tables: Iterable[str]):
+        self._results[key] = result
+        for table in tables:
+            self._keys_by_table[table].add(key)
+
+    def invalidate(self, tables: Iterable[str]):
+        for table in tables:
+            for key in self._keys_by_table.pop(table, ()):
+                self._results.pop(key, None)
+
+    def clear(self):
+        self._results.clear()
+        self._keys_by_table.clear()
+
+
+def _on_execute(orm_execute_state: ORMExecuteState):
+    cache: QueryCache = orm_execute_state.session.info.setdefault(QUERY_CACHE_KEY, QueryCache())
+    if not orm_execute_state.is_select:
+        if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+            cache.invalidate(statement_tables(orm_execute_state.statement))
+        else:
+            # textual statements may write any table
+            cache.clear()
+        return None
+    options = orm_execute_state.execution_options
+    if orm_execute_state.is_column_load or options.get("populate_existing") or options.get("stream_results"):
+        return None
+    key = statement_key(orm_execute_state)
+    if key is None:
+        return None
+    frozen = cache.get(key)
+    if frozen is None:
+        frozen = orm_execute_state.invoke_statement().freeze()
+        cache.set(key, frozen, statement_tables(orm_execute_state.statement))
+    return frozen()
+
+
+def _on_flush(session: Session, flush_context):
+    if cache := session.info.get(QUERY_CACHE_KEY):
+        cache.invalidate(flushed_tables(session))
+
+
+def _on_transaction_end(session: Session):
+    if cache := session.info.get(QUERY_CACHE_KEY):
+        cache.clear()
+
+
+def install_query_cache(session_factory: sessionmaker):
+    """
+    Cache the results of the SELECT statements within each session created by the session factory.
+    A write through the session invalidates the results of the written tables and the whole cache
+    is dropped at the end of each transaction.
+    """
+    event.listen(session_factory, "do_orm_execute", _on_execute)
+    event.listen(session_factory, "after_flush", _on_flush)
+    event.listen(session_factory, "after_commit", _on_transaction_end)
+    event.listen(session_factory, "after_rollback", _on_transaction_end)
+
+
+class CacheBackend(ABC):
+    """
+    Storage of the second level cache, the values are serialized results shared across sessions.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, tables: Iterable[str], ttl: Optional[float] = None):
+        pass
+
+    @abstractmethod
+    def invalidate(self, tables: Iterable[str]):
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+
+class MemoryBackend(CacheBackend):
+    def __init__(self, max_size=1000, ttl: Optional[float] = None):
+        """
+        In-process cache backend which evicts the least recently used values and the expired ones.
+
+        :param max_size: The maximum number of values
+        :param ttl: The default time to live of the values in seconds, None for no expiration
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._values: OrderedDict[str, Tuple[bytes, Optional[float], Tuple[str, ...]]] = OrderedDict()
+        self._keys_by_table: Dict[str, Set[str]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._values)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._values.get(key)
+            if item is None:
+                return None
+            value, expires_at, _ = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._values.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, tables: Iterable[str], ttl: Optional[float] = None):
+        ttl = ttl if ttl is not None else self.ttl
+        tables = tuple(tables)
+        with self._lock:
+            self._remove(key)
+            self._values[key] = (value, time.monotonic() + ttl if ttl is not None else None, tables)
+            for table in tables:
+                self._keys_by_table[table].add(key)
+            while len(self._values) > self.max_size:
+                self._remove(next(iter(self._values)))
+
+    def invalidate(self, tables: Iterable[str]):
+        with self._lock:
+            for table in tables:
+                for key in self._keys_by_table.pop(table, set()):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self._keys_by_table.clear()
+
+    def _remove(self, key: str):
+        item = self._values.pop(key, None)
+        if item is None:
+            return
+        for table in item[2]:
+            keys = self._keys_by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_table[table]
+
+
+class SecondLevelCache:
+    """
+    Cache of query results shared across sessions, the results of a table are invalidated when a
+    session which wrote the table commits. A session which wrote a table, or has pending changes on it,
+    bypasses the cache for the statements on this table until the end of its transaction.
+
+    :param backend: The storage of the cached results
+    """
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_ratio": self.hits / total if total else 0.0}
+
+    def query(self, session: Session, stmt: Executable, ttl: Optional[float] = None) -> Result:
+        cache_key = stmt._generate_cache_key()
+        if cache_key is None:
+            return session.execute(stmt)
+        tables = statement_tables(stmt)
+        if _writes_tables(session, tables):
+            # the session would read or store its own uncommitted rows
+            return session.execute(stmt)
+        key = cache_key.to_offline_string(_statement_cache, stmt, {})
+        cached = self.backend.get(key)
+        if cached is not None:
+            self.hits += 1
+            return merge_frozen_result(session, stmt, pickle.loads(cached), load=False)()
+        self.misses += 1
+        frozen = session.execute(stmt).freeze()
+        self.backend.set(key, pickle.dumps(frozen), tables, ttl=ttl)
+        return frozen()
+
+    def get(self, session: Session, model, pk, ttl: Optional[float] = None):
+        pk = pk if isinstance(pk, tuple) else (pk,)
+        mapper = inspect(model)
+        stmt = select(model).where(*[col == value for col, value in zip(mapper.primary_key, pk)])
+        return self.query(session, stmt, ttl=ttl).scalars().first()
+
+    def install(self, session_factory: sessionmaker):
+        """
+        Track the tables written by the sessions of the factory and invalidate them on commit.
+        """
+        event.listen(session_factory, "do_orm_execute", _track_statement_writes)
+        event.listen(session_factory, "after_flush", _track_flush_writes)
+        event.listen(session_factory, "after_commit", self._on_commit)
+        event.listen(session_factory, "after_rollback", _discard_writes)
+
+    def _on_commit(self, session: Session):
+        tables = session.info.pop(WRITTEN_TABLES_KEY, None)
+        if not tables:
+            return
+        if ALL_TABLES in tables:
+            self.backend.clear()
+        else:
+            self.backend.invalidate(tables)
+
+
+def _written_tables(session: Session) -> Set[str]:
+    return session.info.setdefault(WRITTEN_TABLES_KEY, set())
+
+
+def _writes_tables(session: Session, tables: Set[str]) -> bool:
+    written = session.info.get(WRITTEN_TABLES_KEY, set()) | flushed_tables(session)
+    return ALL_TABLES in written or not written.isdisjoint(tables)
+
+
+def _track_statement_writes(orm_execute_state: ORMExecuteState):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _written_tables(orm_execute_state.session).update(statement_tables(orm_execute_state.statement))
+    elif not orm_execute_state.is_select:
+        _written_tables(orm_execute_state.session).add(ALL_TABLES)
+
+
+def _track_flush_writes(session: Session, flush_context):
+    _written_tables(session).update(flushed_tables(session))
+
+
+def _discard_writes(session: Session):
+    session.info.pop(WRITTEN_TABLES_KEY, None)
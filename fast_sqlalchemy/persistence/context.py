@@ -1,6 +1,32 @@
+from __future__ import annotations
 from contextvars import ContextVar
-from typing import Optional
+from typing import Optional, Union, Callable, TYPE_CHECKING
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-_session: ContextVar[Optional[Session]] = ContextVar("session", default=None)
+if TYPE_CHECKING:
+    from .pool import RequestPoolStats
+    from .profiler import QueryStats
 
+
+class LazySession:
+    """
+    Placeholder stored in the session context which creates the session only on first access.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session]):
+        self._session_factory = session_factory
+        self.session: Optional[Session] = None
+
+    def get(self) -> Session:
+        if self.session is None:
+            self.session = self._session_factory()
+        return self.session
+
+
+_session: ContextVar[Optional[Union[Session, LazySession]]] = ContextVar("session", default=None)
+_async_session: ContextVar[Optional[AsyncSession]] = ContextVar("async_session", default=None)
+_tenant: ContextVar[Optional[str]] = ContextVar("tenant", default=None)
+_pool_wait: ContextVar[Optional[RequestPoolStats]] = ContextVar("pool_wait", default=None)
+_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+_route: ContextVar[Optional[str]] = ContextVar("route", default=None)
@@ -1,32 +1,273 @@
 from __future__ import annotations
 import contextlib
+from typing import Sequence, Iterable, Iterator, Optional
 
 from sqlalchemy import create_engine
-from sqlalchemy.engine import URL, make_url
+from sqlalchemy.engine import URL, Result, Row, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql import Executable
 
-from .context import _session
+from . import bulk
+from .cache import install_query_cache, CacheBackend, SecondLevelCache
+from .pool import PoolMetrics
+from .profiler import QueryProfiler
+from .slow_queries import SlowQueryLog
+from .transaction import Transaction, TransactionMetrics
+from .warmup import QueryRegistry, CompiledCacheStats, warmup
+from .context import _session, _async_session, LazySession
+from .routing import RoutingSession, REPLICA_STRATEGIES
 
 
 class Database:
-    def __init__(self, url: URL | str , autoflush=False, autocommit=False, **engine_options):
+    def __init__(self, url: URL | str , autoflush=False, autocommit=False, replica_urls: Sequence[URL | str] = (),
+                 replica_strategy="round_robin", query_cache=False, cache_backend: Optional[CacheBackend] = None,
+                 pool_metrics=False, profile_queries=False, slow_query_threshold: Optional[float] = None,
+                 explain_slow_queries=False, **engine_options):
+        """
+        Create a database object which holds the engine and the session factory.
+
+        :param url: The url of the primary database
+        :param autoflush: Autoflush option of the session
+        :param autocommit: Autocommit option of the session
+        :param replica_urls: Urls of read replicas, the SELECT statements of sessions without writes are
+            sent to them
+        :param replica_strategy: How a replica is selected, either 'round_robin' or 'least_connections'
+        :param query_cache: Cache the results of the SELECT statements within each session, the results are
+            invalidated by the writes of the session on their tables and dropped at the end of the transaction
+        :param cache_backend: Enable the second level cache used by cached_get and cached_query with this
+            backend, ex: MemoryBackend()
+        :param pool_metrics: Instrument the pool of the primary engine, see pool_stats()
+        :param profile_queries: Profile the statements of each request, the DatabaseMiddleware then adds
+            a Server-Timing header and logs the number of queries, their time and the possible N+1
+        :param slow_query_threshold: Log the statements which take more than this duration in seconds,
+            see :class:`fast_sqlalchemy.persistence.slow_queries.SlowQueryLog`
+        :param explain_slow_queries: Capture the plan of the slow queries in a background thread
+        :param engine_options: Sqlalchemy engine parameters, shared by the primary and the replicas
+        """
+        self._create_engines(url, replica_urls, engine_options)
+        self._session_factory = self._create_session_factory(autoflush, autocommit, replica_strategy)
+        if query_cache:
+            install_query_cache(self._session_factory)
+        self.pool_metrics = PoolMetrics(self.engine) if pool_metrics else None
+        self.profiler = QueryProfiler([self.engine, *self.replicas]) if profile_queries else None
+        self.slow_query_log = SlowQueryLog([self.engine, *self.replicas], slow_query_threshold,
+                                           explain=explain_slow_queries) if slow_query_threshold is not None else None
+        self.cache = SecondLevelCache(cache_backend) if cache_backend is not None else None
+        if self.cache is not None:
+            self.cache.install(self._session_factory)
+        self.queries = QueryRegistry()
+        self.compiled_cache = None
+        self.transaction_metrics = TransactionMetrics()
+
+    def _create_engines(self, url: URL | str, replica_urls: Sequence[URL | str], engine_options: dict):
+        """
+        Set the url, the engine and the replicas, overridden by the databases which resolve their engine
+        at runtime.
+        """
         self.url = make_url(url)
         self.engine = create_engine(self.url, **engine_options)
-        self._session_factory = sessionmaker(bind=self.engine, autoflush=autoflush, autocommit=autocommit)
+        self.replicas = [create_engine(make_url(replica_url), **engine_options) for replica_url in replica_urls]
+
+    def _create_session_factory(self, autoflush: bool, autocommit: bool, replica_strategy: str) -> sessionmaker:
+        if self.replicas:
+            return sessionmaker(bind=self.engine, autoflush=autoflush, autocommit=autocommit, class_=RoutingSession,
+                                replica_selector=REPLICA_STRATEGIES[replica_strategy](self.replicas))
+        return sessionmaker(bind=self.engine, autoflush=autoflush, autocommit=autocommit)
+
     @property
     def session(self) -> Session:
         session = _session.get()
         assert session ,"Make sure to use the session within a session context"
+        if isinstance(session, LazySession):
+            return session.get()
         return session
 
+    @property
+    def has_session(self) -> bool:
+        """
+        Whether a session has been created within the current session context, a lazy
+        session context which hasn't been accessed yet doesn't have one.
+        """
+        session = _session.get()
+        if isinstance(session, LazySession):
+            return session.session is not None
+        return session is not None
+
+    def _create_session(self) -> Session:
+        return self._session_factory()
+
     @contextlib.contextmanager
-    def session_ctx(self):
-        session = self._session_factory()
+    def session_ctx(self, lazy=False):
+        """
+        Create a session context.
+
+        :param lazy: If true, the session is only created on the first access to the session
+            property, so that a context which never queries the database doesn't touch the pool.
+            The context then yields the LazySession placeholder instead of the session.
+        """
+        session = LazySession(self._create_session) if lazy else self._create_session()
         token = _session.set(session)
         try:
             yield session
         finally:
-            session.close()
+            if not lazy:
+                session.close()
+            elif session.session is not None:
+                session.session.close()
             _session.reset(token)
 
+    def transaction(self, retries=0, backoff=0.05, max_backoff=2.0) -> Transaction:
+        """
+        Run a unit of work in a SAVEPOINT when the session of the context is in a transaction, otherwise
+        in a fresh transaction committed at the end. Used as a decorator, the function is re-run on deadlocks,
+        serialization failures and lock timeouts, see transaction_metrics for the retries.
+
+        **Example**:
+
+        >>> @db.transaction(retries=3)
+        >>> def transfer(from_id, to_id, amount):
+        >>>     ...
+
+        :param retries: The maximum number of re-runs, only supported by the decorator
+        :param backoff: The base delay in seconds of the jittered exponential backoff
+        :param max_backoff: The maximum delay in seconds
+        """
+        return Transaction(self, retries=retries, backoff=backoff, max_backoff=max_backoff)
+
+    def pool_stats(self) -> dict:
+        """
+        Return the gauges, the connection ages and the checkout wait time histogram of the pool.
+        """
+        assert self.pool_metrics is not None, "Make sure to create the database with pool_metrics=True"
+        return self.pool_metrics.stats()
+
+    def warmup(self, modules: Iterable[str] = (), connections: Optional[int] = None) -> dict:
+        """
+        Prepare a fresh worker to serve its first requests at steady state latency: import the modules
+        which register query builders with db.queries.register, compile their statements into the compiled
+        cache of the engines and open the pooled connections. The compiled cache hits are then counted,
+        see compiled_cache_stats(). Return the number of compiled statements and opened connections.
+
+        **Example**:
+
+        >>> app.add_event_handler("startup", lambda: db.warmup(modules=["app.users.queries"]))
+
+        :param modules: The modules to import
+        :param connections: The number of connections to open per engine, defaults to the pool size
+        """
+        if self.compiled_cache is None:
+            self.compiled_cache = CompiledCacheStats([self.engine, *self.replicas])
+        return warmup([self.engine, *self.replicas], self.queries, modules=modules, connections=connections)
+
+    def compiled_cache_stats(self) -> dict:
+        """
+        Return the compiled cache hits, misses and hit ratio of the statements executed since the warmup.
+        """
+        assert self.compiled_cache is not None, "Make sure to warm up the database"
+        return self.compiled_cache.stats()
+
+    def stream(self, stmt: Executable, chunk_size=1000) -> Iterator[Row]:
+        """
+        Execute the statement with a server side cursor and return an iterator over the rows which are fetched
+        chunk_size at a time, so that the memory stays bounded whatever the number of rows.
+        The statement runs on its own session, outside the transaction of the session of the current context,
+        so that a commit of the latter doesn't close the cursor. It's executed on the first iteration and its
+        connection is released once the rows are exhausted or the iterator is closed, both must happen on the
+        same thread.
 
+        :param stmt: The statement to execute
+        :param chunk_size: The number of rows fetched at a time
+        """
+        session = self._create_session()
+
+        def rows():
+            try:
+                result = session.execute(stmt.execution_options(stream_results=True, yield_per=chunk_size))
+                try:
+                    yield from result
+                finally:
+                    result.close()
+            finally:
+                session.close()
+        return rows()
+
+    def cached_query(self, stmt: Executable, ttl: Optional[float] = None) -> Result:
+        """
+        Execute a statement through the second level cache, the result is shared across sessions until it
+        expires or a session which wrote one of its tables commits.
+
+        :param stmt: The statement to execute
+        :param ttl: The time to live of the result in seconds, defaults to the ttl of the backend
+        """
+        assert self.cache is not None, "Make sure to create the database with a cache backend"
+        return self.cache.query(self.session, stmt, ttl=ttl)
+
+    def cached_get(self, model, pk, ttl: Optional[float] = None):
+        """
+        Return the instance of a model by primary key through the second level cache.
+
+        :param model: The mapped class
+        :param pk: The primary key, a tuple for composite primary keys
+        :param ttl: The time to live of the result in seconds, defaults to the ttl of the backend
+        """
+        assert self.cache is not None, "Make sure to create the database with a cache backend"
+        return self.cache.get(self.session, model, pk, ttl=ttl)
+
+    def bulk_insert(self, table_or_model, rows: Iterable[dict], batch_size=1000) -> int:
+        """
+        Insert the rows by batches with the session of the current context, bypassing the ORM unit of work.
+        See :func:`fast_sqlalchemy.persistence.bulk.bulk_insert`.
+        """
+        return bulk.bulk_insert(self.session, table_or_model, rows, batch_size=batch_size)
+
+    def bulk_upsert(self, table_or_model, rows: Iterable[dict], conflict_cols: Sequence[str],
+                    update_cols: Optional[Sequence[str]] = None, batch_size=1000) -> int:
+        """
+        Upsert the rows by batches with the session of the current context.
+        See :func:`fast_sqlalchemy.persistence.bulk.bulk_upsert`.
+        """
+        return bulk.bulk_upsert(self.session, table_or_model, rows, conflict_cols=conflict_cols,
+                                update_cols=update_cols, batch_size=batch_size)
+
+    def bulk_update(self, table_or_model, rows: Iterable[dict], key_cols: Optional[Sequence[str]] = None,
+                    batch_size=1000) -> int:
+        """
+        Update the rows by batches with the session of the current context.
+        See :func:`fast_sqlalchemy.persistence.bulk.bulk_update`.
+        """
+        return bulk.bulk_update(self.session, table_or_model, rows, key_cols=key_cols, batch_size=batch_size)
+
+
+class AsyncDatabase:
+    def __init__(self, url: URL | str, autoflush=False, expire_on_commit=False, **engine_options):
+        """
+        Asyncio counterpart of the Database object, the url must use an async driver
+        (ex: 'postgresql+asyncpg', 'sqlite+aiosqlite').
+
+        :param url: The url of the database
+        :param autoflush: Autoflush option of the session
+        :param expire_on_commit: Expire the instances after commit, disabled by default as lazy loading
+            attributes after a commit would require an implicit IO
+        :param engine_options: Sqlalchemy engine parameters
+        """
+        self.url = make_url(url)
+        self.engine = create_async_engine(self.url, **engine_options)
+        self._session_factory = sessionmaker(bind=self.engine, class_=AsyncSession, autoflush=autoflush,
+                                             expire_on_commit=expire_on_commit)
+
+    @property
+    def session(self) -> AsyncSession:
+        session = _async_session.get()
+        assert session, "Make sure to use the session within an async session context"
+        return session
+
+    @contextlib.asynccontextmanager
+    async def async_session_ctx(self):
+        session = self._session_factory()
+        token = _async_session.set(session)
+        try:
+            yield session
+        finally:
+            await session.close()
+            _async_session.reset(token)
@@ -1,34 +1,237 @@
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
-from starlette.requests import Request
-from starlette.responses import Response
-from starlette.types import ASGIApp
-from fast_sqlalchemy.persistence.database import  Database
+import contextlib
+import inspect
+import logging
+from typing import Awaitable, Callable, Optional, Union
 
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Scope, Receive, Send, Message
+from fast_sqlalchemy.persistence.context import _tenant, _pool_wait, _route
+from fast_sqlalchemy.persistence.database import Database, AsyncDatabase
+from fast_sqlalchemy.persistence.pool import RequestPoolStats
+from fast_sqlalchemy.persistence.profiler import log_query_stats
 
-class DatabaseMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app: ASGIApp, db: Database):
-        super().__init__(app)
+logger = logging.getLogger(__name__)
+
+CommitErrorHandler = Callable[[Exception, Scope], Union[None, Awaitable[None]]]
+
+
+def write_behind(endpoint: Callable) -> Callable:
+    """
+    Opt-in an endpoint to the write-behind mode of the autocommit middlewares: the response is sent
+    before the session is committed.
+
+    **Example**:
+
+    >>> @router.post("/events")
+    >>> @write_behind
+    >>> def create_event():
+    >>>     ...
+    """
+    endpoint.__write_behind__ = True
+    return endpoint
+
+
+def _is_write_behind(scope: Scope, write_behind: bool) -> bool:
+    # the router sets the endpoint in the scope before the response starts
+    return write_behind or getattr(scope.get("endpoint"), "__write_behind__", False)
+
+
+def _log_commit_error(error: Exception, scope: Scope):
+    logger.error(f"Write-behind commit of {scope.get('method', '')} {scope.get('path', '')} failed",
+                 exc_info=error)
+
+
+class DatabaseMiddleware:
+    """
+    Pure ASGI middleware which opens a session context for the whole http request,
+    the session stays open until the response body has been sent.
+    With lazy=True, the session is only created if the request uses it.
+    If the pool of the database is instrumented, the time the request waited for pooled connections
+    is available in request.state.db_pool.
+    If the database profiles the queries, a Server-Timing header is added to the response and the
+    queries of the request are logged.
+    """
+
+    def __init__(self, app: ASGIApp, db: Database, lazy=False):
+        self.app = app
         self.db = db
+        self.lazy = lazy
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(self._route_ctx(scope))
+            if self.db.pool_metrics is not None:
+                stack.enter_context(self._pool_wait_ctx(scope))
+            if self.db.profiler is not None:
+                send = stack.enter_context(self._profile_ctx(scope, send))
+            stack.enter_context(self.db.session_ctx(lazy=self.lazy))
+            await self.app(scope, receive, send)
+
+    @contextlib.contextmanager
+    def _route_ctx(self, scope: Scope):
+        token = _route.set(f"{scope.get('method', '')} {scope.get('path', '')}")
+        try:
+            yield
+        finally:
+            _route.reset(token)
 
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        with self.db.session_ctx():
-            return await call_next(request)
+    @contextlib.contextmanager
+    def _pool_wait_ctx(self, scope: Scope):
+        pool_stats = RequestPoolStats()
+        scope.setdefault("state", {})["db_pool"] = pool_stats
+        token = _pool_wait.set(pool_stats)
+        try:
+            yield
+        finally:
+            _pool_wait.reset(token)
 
+    @contextlib.contextmanager
+    def _profile_ctx(self, scope: Scope, send: Send):
+        with self.db.profiler.profile() as stats:
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", stats.server_timing())
+                await send(message)
 
-class AutocommitMiddleware(BaseHTTPMiddleware):
+            yield send_wrapper
+        log_query_stats(stats, scope.get("method", ""), scope.get("path", ""))
+
+
+class AutocommitMiddleware:
     """
     @WARNING Make sure to use this middleware with the DatabaseMiddleware after it in the
     middlewares stack.
-    This middleware autocommit at the end of the request.
-    If the status code is above 400, the commit is cancelled.
+    This middleware autocommit when the response starts, before it's sent to the client.
+    If the status code is above 400, the transaction is rolled back instead.
+    Writes made while a streaming body is produced are not committed.
+    In write-behind mode, enabled for every request or per endpoint with the write_behind decorator,
+    the session is committed once the response has been sent, the commit errors are then passed to
+    on_commit_error, which logs them by default.
+
+    :param write_behind: Commit after the response of every request
+    :param on_commit_error: A callable, or a coroutine function, called with the error and the ASGI scope
+        when a write-behind commit fails
     """
 
-    def __init__(self, app: ASGIApp, db: Database):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp, db: Database, write_behind=False,
+                 on_commit_error: CommitErrorHandler = _log_commit_error):
+        self.app = app
         self.db = db
+        self.write_behind = write_behind
+        self.on_commit_error = on_commit_error
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        deferred = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal deferred
+            if message["type"] == "http.response.start" and self.db.has_session:
+                if message["status"] >= 400:
+                    self.db.session.rollback()
+                elif _is_write_behind(scope, self.write_behind):
+                    deferred = True
+                else:
+                    self.db.session.commit()
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+        if deferred:
+            try:
+                self.db.session.commit()
+            except Exception as e:
+                self.db.session.rollback()
+                if inspect.isawaitable(result := self.on_commit_error(e, scope)):
+                    await result
+
+
+class TenantMiddleware:
+    """
+    @WARNING Make sure to use this middleware with the DatabaseMiddleware before it in the
+    middlewares stack, so that the session is bound to the engine of the tenant.
+    This middleware set the tenant of the request used by the TenantDatabase.
+
+    :param get_tenant: A callable which returns the tenant key from the ASGI scope
+    """
+
+    def __init__(self, app: ASGIApp, get_tenant: Callable[[Scope], Optional[str]]):
+        self.app = app
+        self.get_tenant = get_tenant
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _tenant.set(self.get_tenant(scope))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _tenant.reset(token)
+
+
+class AsyncDatabaseMiddleware:
+    """
+    Pure ASGI middleware which opens an async session context for the whole http request,
+    the session stays open until the response body has been sent.
+    """
+
+    def __init__(self, app: ASGIApp, db: AsyncDatabase):
+        self.app = app
+        self.db = db
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        async with self.db.async_session_ctx():
+            await self.app(scope, receive, send)
+
+
+class AsyncAutocommitMiddleware:
+    """
+    @WARNING Make sure to use this middleware with the AsyncDatabaseMiddleware after it in the
+    middlewares stack.
+    This middleware autocommit when the response starts, before it's sent to the client.
+    If the status code is above 400, the transaction is rolled back instead.
+    Writes made while a streaming body is produced are not committed.
+    The write-behind mode is the same as the one of the AutocommitMiddleware.
+    """
+
+    def __init__(self, app: ASGIApp, db: AsyncDatabase, write_behind=False,
+                 on_commit_error: CommitErrorHandler = _log_commit_error):
+        self.app = app
+        self.db = db
+        self.write_behind = write_behind
+        self.on_commit_error = on_commit_error
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        deferred = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal deferred
+            if message["type"] == "http.response.start":
+                if message["status"] >= 400:
+                    await self.db.session.rollback()
+                elif _is_write_behind(scope, self.write_behind):
+                    deferred = True
+                else:
+                    await self.db.session.commit()
+            await send(message)
 
-    async def dispatch( self, request: Request, call_next: RequestResponseEndpoint ) -> Response:
-        response = await call_next(request)
-        if response.status_code < 400:
-            self.db.session.commit()
-        return response
+        await self.app(scope, receive, send_wrapper)
+        if deferred:
+            try:
+                await self.db.session.commit()
+            except Exception as e:
+                await self.db.session.rollback()
+                if inspect.isawaitable(result := self.on_commit_error(e, scope)):
+                    await result
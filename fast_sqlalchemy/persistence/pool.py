@@ -0,0 +1,150 @@
+from __future__ import annotations
+import threading, time
+from typing import Dict, Optional, Sequence
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+
+from fast_sqlalchemy.histogram import DEFAULT_BUCKETS, Histogram
+
+from .context import _pool_wait
+
+
+class RequestPoolStats:
+    """
+    Time spent by a request waiting for pooled connections.
+    """
+
+    def __init__(self):
+        self.wait_time = 0.0
+        self.checkouts = 0
+
+
+class PoolMetrics:
+    def __init__(self, engine: Engine, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        Instrument the pool of an engine with the pool events.
+        The checkout wait time is the time spent getting a connection from the pool, including the
+        time to open a new connection when the pool isn't full.
+
+        :param engine: The engine to instrument
+        :param buckets: The buckets of the wait time histogram in seconds
+        """
+        self.engine = engine
+        self.wait_time = Histogram(buckets)
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidations = 0
+        self._connected_at: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        event.listen(engine.pool, "connect", self._on_connect)
+        event.listen(engine.pool, "checkout", self._on_checkout)
+        event.listen(engine.pool, "close", self._on_close)
+        event.listen(engine.pool, "invalidate", self._on_invalidate)
+        event.listen(engine, "engine_disposed", lambda _: self._instrument(engine.pool))
+        self._instrument(engine.pool)
+
+    def _instrument(self, pool: Pool):
+        do_get = pool._do_get
+
+        def timed_do_get():
+            start = time.perf_counter()
+            try:
+                return do_get()
+            finally:
+                self._observe_wait(time.perf_counter() - start)
+        pool._do_get = timed_do_get
+
+    def _observe_wait(self, duration: float):
+        with self._lock:
+            self.wait_time.observe(duration)
+        if (request_stats := _pool_wait.get()) is not None:
+            request_stats.wait_time += duration
+            request_stats.checkouts += 1
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+            self._connected_at[id(connection_record)] = time.monotonic()
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+
+    def _on_close(self, dbapi_connection, connection_record):
+        with self._lock:
+            self._connected_at.pop(id(connection_record), None)
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+            self._connected_at.pop(id(connection_record), None)
+
+    def stats(self) -> dict:
+        """
+        Return the gauges of the pool, the connection ages in seconds and the checkout wait time histogram.
+        """
+        pool = self.engine.pool
+        now = time.monotonic()
+        with self._lock:
+            ages = [now - connected_at for connected_at in self._connected_at.values()]
+            return {
+                "size": _pool_gauge(pool, "size"),
+                "checked_in": _pool_gauge(pool, "checkedin"),
+                "checked_out": _pool_gauge(pool, "checkedout"),
+                "overflow": _pool_gauge(pool, "overflow"),
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "invalidations": self.invalidations,
+                "connection_age_max": max(ages, default=0.0),
+                "connection_age_avg": sum(ages) / len(ages) if ages else 0.0,
+                "wait_time": {"buckets": self.wait_time.cumulative_counts(), "sum": self.wait_time.sum,
+                              "count": self.wait_time.count},
+            }
+
+    def prometheus(self, prefix="sqlalchemy_pool") -> str:
+        """
+        Return the metrics in the Prometheus text format.
+
+        :param prefix: The prefix of the metric names
+        """
+        stats = self.stats()
+        lines = []
+        for name, kind in (("size", "gauge"), ("checked_in", "gauge"), ("checked_out", "gauge"),
+                           ("overflow", "gauge"), ("connects", "counter"), ("checkouts", "counter"),
+                           ("invalidations", "counter"), ("connection_age_max", "gauge"),
+                           ("connection_age_avg", "gauge")):
+            if stats[name] is None:
+                continue
+            metric = f"{prefix}_{name}_total" if kind == "counter" else f"{prefix}_{name}"
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.append(f"{metric} {stats[name]}")
+        metric = f"{prefix}_wait_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        for bound, count in stats["wait_time"]["buckets"].items():
+            lines.append(f'{metric}_bucket{{le="{bound}"}} {count}')
+        lines.append(f"{metric}_sum {stats['wait_time']['sum']}")
+        lines.append(f"{metric}_count {stats['wait_time']['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def _pool_gauge(pool: Pool, name: str) -> Optional[int]:
+    # only the QueuePool has a size and an overflow
+    gauge = getattr(pool, name, None)
+    return gauge() if gauge else None
+
+
+def prometheus_endpoint(metrics: PoolMetrics, prefix="sqlalchemy_pool"):
+    """
+    Return an endpoint which exposes the pool metrics in the Prometheus text format.
+
+    **Example**:
+
+    >>> app.add_route("/metrics/pool", prometheus_endpoint(db.pool_metrics))
+    """
+    async def endpoint(request: Request):
+        return PlainTextResponse(metrics.prometheus(prefix=prefix), media_type="text/plain; version=0.0.4")
+    return endpoint
@@ -0,0 +1,128 @@
+from __future__ import annotations
+import contextlib, logging, re, threading, time
+from collections import Counter
+from typing import Iterable, List, Tuple, Set
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .context import _query_stats
+
+logger = logging.getLogger(__name__)
+
+_whitespaces = re.compile(r"\s+")
+
+
+class QueryStats:
+    """
+    Statements executed within a profiling context.
+
+    :param n_plus_one_threshold: The number of executions of a statement from which it's flagged as N+1
+    :param max_slowest: The number of slowest statements kept
+    """
+
+    def __init__(self, n_plus_one_threshold=5, max_slowest=5):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.max_slowest = max_slowest
+        self.count = 0
+        self.total_time = 0.0
+        self.statements: Counter[str] = Counter()
+        self.slowest: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, duration: float):
+        statement = _whitespaces.sub(" ", statement).strip()
+        with self._lock:
+            self.count += 1
+            self.total_time += duration
+            self.statements[statement] += 1
+            if len(self.slowest) < self.max_slowest or duration > self.slowest[-1][0]:
+                self.slowest.append((duration, statement))
+                self.slowest.sort(key=lambda item: item[0], reverse=True)
+                del self.slowest[self.max_slowest:]
+
+    @property
+    def n_plus_one(self) -> List[Tuple[str, int]]:
+        """
+        The statements executed at least n_plus_one_threshold times, likely issued in a loop.
+        """
+        return [(statement, count) for statement, count in self.statements.most_common()
+                if count >= self.n_plus_one_threshold]
+
+    def server_timing(self, name="db") -> str:
+        """
+        Return the value of a Server-Timing header with the total time in milliseconds.
+        """
+        return f'{name};dur={self.total_time * 1000:.2f};desc="{self.count} queries"'
+
+    def to_dict(self) -> dict:
+        return {
+            "sql_queries": self.count,
+            "sql_time_ms": round(self.total_time * 1000, 2),
+            "sql_slowest": [{"statement": statement, "duration_ms": round(duration * 1000, 2)}
+                            for duration, statement in self.slowest],
+            "sql_n_plus_one": [{"statement": statement, "count": count} for statement, count in self.n_plus_one],
+        }
+
+
+class QueryProfiler:
+    def __init__(self, engines: Iterable[Engine], n_plus_one_threshold=5, max_slowest=5):
+        """
+        Profile the statements executed by engines with the cursor execute events. The statements are
+        recorded in the QueryStats of the current profiling context.
+
+        :param engines: The engines to profile
+        :param n_plus_one_threshold: The number of executions of a statement from which it's flagged as N+1
+        :param max_slowest: The number of slowest statements kept
+        """
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.max_slowest = max_slowest
+        self._collectors: Set[QueryStats] = set()
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["query_start"].pop()
+        if (stats := _query_stats.get()) is not None:
+            stats.record(statement, duration)
+        for collector in tuple(self._collectors):
+            collector.record(statement, duration)
+
+    def _create_stats(self) -> QueryStats:
+        return QueryStats(n_plus_one_threshold=self.n_plus_one_threshold, max_slowest=self.max_slowest)
+
+    @contextlib.contextmanager
+    def profile(self):
+        """
+        Record the statements executed within the current context, this is the context used
+        by the DatabaseMiddleware for each request.
+        """
+        stats = self._create_stats()
+        token = _query_stats.set(stats)
+        try:
+            yield stats
+        finally:
+            _query_stats.reset(token)
+
+    @contextlib.contextmanager
+    def capture(self):
+        """
+        Record every statement executed by the engine, whatever the context or thread.
+        """
+        stats = self._create_stats()
+        self._collectors.add(stats)
+        try:
+            yield stats
+        finally:
+            self._collectors.discard(stats)
+
+
+def log_query_stats(stats: QueryStats, method: str, path: str):
+    logger.info(f"{method} {path} {stats.count} queries in {stats.total_time * 1000:.2f}ms",
+                extra={"method": method, "path": path, **stats.to_dict()})
+    for statement, count in stats.n_plus_one:
+        logger.warning(f"Possible N+1 on {method} {path}, statement executed {count} times: {statement}")
@@ -0,0 +1,79 @@
+import asyncio, contextvars, csv, io, json
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterator, Any
+
+from sqlalchemy.engine import Row
+from sqlalchemy.sql import Executable
+from starlette.responses import StreamingResponse
+
+from fast_sqlalchemy.persistence.bulk import chunked
+from fast_sqlalchemy.persistence.database import Database
+
+
+def row_to_dict(row: Row) -> dict:
+    return dict(row._mapping)
+
+
+async def _iterate_in_thread(iterator: Iterator[str]) -> AsyncIterator[str]:
+    # the DBAPI connections can't move between threads, unlike the sync iterators of a StreamingResponse
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stream")
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    try:
+        while True:
+            chunk = await loop.run_in_executor(executor, context.run, next, iterator, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        executor.submit(context.run, iterator.close)
+        executor.shutdown(wait=False)
+
+
+def _ndjson_lines(rows: Iterator[Row], serializer: Callable[[Row], Any], chunk_size: int):
+    for chunk in chunked(rows, chunk_size):
+        yield "".join(json.dumps(serializer(row), default=str) + "\n" for row in chunk)
+
+
+def _csv_lines(rows: Iterator[Row], chunk_size: int):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header = False
+    for chunk in chunked(rows, chunk_size):
+        if not header:
+            writer.writerow(chunk[0]._fields)
+            header = True
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def ndjson_response(db: Database, stmt: Executable, serializer: Callable[[Row], Any] = row_to_dict,
+                    chunk_size=1000, **response_options) -> StreamingResponse:
+    """
+    Stream the rows of a statement as newline delimited json. The rows are fetched on a dedicated thread and
+    connection, see Database.stream.
+
+    :param db: The database object
+    :param stmt: The statement to execute
+    :param serializer: Convert a row to a json serializable object, defaults to a dictionary of the columns
+    :param chunk_size: The number of rows fetched and sent at a time
+    :param response_options: Parameters of the StreamingResponse
+    """
+    lines = _ndjson_lines(db.stream(stmt, chunk_size=chunk_size), serializer, chunk_size)
+    return StreamingResponse(_iterate_in_thread(lines), media_type="application/x-ndjson", **response_options)
+
+
+def csv_response(db: Database, stmt: Executable, chunk_size=1000, **response_options) -> StreamingResponse:
+    """
+    Stream the rows of a statement as csv with a header row. The rows are fetched on a dedicated thread and
+    connection, see Database.stream.
+
+    :param db: The database object
+    :param stmt: The statement to execute
+    :param chunk_size: The number of rows fetched and sent at a time
+    :param response_options: Parameters of the StreamingResponse
+    """
+    lines = _csv_lines(db.stream(stmt, chunk_size=chunk_size), chunk_size)
+    return StreamingResponse(_iterate_in_thread(lines), media_type="text/csv", **response_options)
@@ -0,0 +1,63 @@
+import itertools
+from typing import Sequence, Callable, Optional
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+
+def round_robin(replicas: Sequence[Engine]) -> Callable[[], Engine]:
+    """
+    Select the replicas one after the other.
+    """
+    cycle = itertools.cycle(replicas)
+    return lambda: next(cycle)
+
+
+def least_connections(replicas: Sequence[Engine]) -> Callable[[], Engine]:
+    """
+    Select the replica with the fewest checked out connections of its pool.
+    """
+    def checked_out(engine: Engine):
+        checkedout = getattr(engine.pool, "checkedout", None)
+        return checkedout() if checkedout else 0
+
+    return lambda: min(replicas, key=checked_out)
+
+
+REPLICA_STRATEGIES = {
+    "round_robin": round_robin,
+    "least_connections": least_connections,
+}
+
+
+class RoutingSession(Session):
+    """
+    A session which sends the SELECT statements to a read replica as long as the session has no pending
+    writes. Once the session has written or flushed, every statement sticks to the primary until the
+    session is closed.
+
+    :param replica_selector: A callable which returns the replica engine to use
+    """
+
+    def __init__(self, *args, replica_selector: Optional[Callable[[], Engine]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replica_selector = replica_selector
+        self.use_primary = False
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kw):
+        primary = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kw)
+        # an explicit bind or a session bound to a connection (ex: a testing transaction) is never routed
+        if self.replica_selector is None or bind is not None or not isinstance(primary, Engine):
+            return primary
+        if self.use_primary:
+            return primary
+        if self._flushing or not isinstance(clause, Select) or clause._for_update_arg is not None \
+                or not self._is_clean():
+            self.use_primary = True
+            return primary
+        return self.replica_selector()
+
+    def close(self):
+        super().close()
+        self.use_primary = False
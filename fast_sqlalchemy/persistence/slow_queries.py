@@ -0,0 +1,137 @@
+from __future__ import annotations
+import contextlib, logging, re, time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from datetime import datetime
+from logging import LogRecord
+from typing import Iterable, Optional
+
+from sqlalchemy import event, Table, MetaData, Column, Integer, String, Text, Float, DateTime
+from sqlalchemy.engine import Engine
+
+from .context import _route
+
+logger = logging.getLogger(__name__)
+
+_whitespaces = re.compile(r"\s+")
+# set while a slow query is logged, so that the statements of a DatabaseHandler aren't profiled
+_logging_slow_query: ContextVar[bool] = ContextVar("logging_slow_query", default=False)
+
+
+@contextlib.contextmanager
+def ignore_slow_queries():
+    """
+    Don't log the slow statements executed within the context, like the inserts of a log handler which
+    stores the slow queries.
+    """
+    token = _logging_slow_query.set(True)
+    try:
+        yield
+    finally:
+        _logging_slow_query.reset(token)
+
+
+EXPLAIN_PREFIXES = {
+    "sqlite": "EXPLAIN QUERY PLAN",
+    "postgresql": "EXPLAIN",
+    "mysql": "EXPLAIN",
+    "mariadb": "EXPLAIN",
+}
+
+
+def parameters_shape(parameters, executemany=False) -> str:
+    """
+    Return the type of the parameters without their values, ex: '{id: int, name: str}'.
+    """
+    if executemany:
+        return f"{len(parameters)} x {parameters_shape(parameters[0])}" if parameters else "[]"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in parameters.items()) + "}"
+    return "(" + ", ".join(type(value).__name__ for value in parameters or ()) + ")"
+
+
+class SlowQueryLog:
+    def __init__(self, engines: Iterable[Engine], threshold: float, explain=False):
+        """
+        Log the statements which take more than threshold seconds with the logger of this module, the
+        record has the attributes sql, parameters, duration_ms, route and plan.
+        Attach a DatabaseHandler to the logger 'fast_sqlalchemy.persistence.slow_queries' to store them.
+
+        :param engines: The engines to watch
+        :param threshold: The duration in seconds from which a statement is logged
+        :param explain: Capture the plan of the slow SELECT statements in a background thread, the record
+            is then logged by this thread once the plan is known
+        """
+        self.threshold = threshold
+        self.explain = explain
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain") \
+            if explain else None
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["slow_query_start"].pop()
+        if duration < self.threshold or _logging_slow_query.get():
+            return
+        extra = {
+            "sql": _whitespaces.sub(" ", statement).strip(),
+            "parameters": parameters_shape(parameters, executemany),
+            "duration_ms": round(duration * 1000, 2),
+            "route": _route.get(),
+            "plan": None,
+        }
+        is_select = statement.lstrip()[:6].upper() in ("SELECT", "WITH")
+        if self._executor is not None and is_select and not executemany:
+            self._executor.submit(self._explain_and_log, conn.engine, statement, parameters, extra)
+        else:
+            self._log(extra)
+
+    def _explain_and_log(self, engine: Engine, statement: str, parameters, extra: dict):
+        # runs in the explain thread, the EXPLAIN statement itself must not be logged
+        _logging_slow_query.set(True)
+        prefix = EXPLAIN_PREFIXES.get(engine.dialect.name)
+        if prefix is not None:
+            try:
+                with engine.connect() as conn:
+                    rows = conn.exec_driver_sql(f"{prefix} {statement}", parameters).fetchall()
+                extra["plan"] = "\n".join(" ".join(str(value) for value in row) for row in rows)
+            except Exception:
+                logger.exception("Unable to explain the slow query")
+        self._log(extra)
+
+    def _log(self, extra: dict):
+        with ignore_slow_queries():
+            logger.warning(f"Slow query ({extra['duration_ms']}ms) on {extra['route']}: {extra['sql']}", extra=extra)
+
+    def shutdown(self, wait=True):
+        """
+        Stop the explain thread, waiting for the pending plans by default.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+
+
+def slow_query_table(metadata: MetaData, name="slow_queries") -> Table:
+    """
+    Create a table which stores the slow queries with a DatabaseHandler and map_slow_query.
+    """
+    return Table(name, metadata,
+                 Column("id", Integer, primary_key=True),
+                 Column("created_at", DateTime),
+                 Column("route", String(255)),
+                 Column("sql", Text),
+                 Column("parameters", Text),
+                 Column("duration_ms", Float),
+                 Column("plan", Text))
+
+
+def map_slow_query(record: LogRecord) -> dict:
+    """
+    Mapping of the slow query records for the DatabaseHandler.
+    """
+    return {"created_at": datetime.fromtimestamp(record.created), "route": record.route, "sql": record.sql,
+            "parameters": record.parameters, "duration_ms": record.duration_ms, "plan": record.plan}
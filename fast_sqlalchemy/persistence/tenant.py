@@ -0,0 +1,113 @@
+from __future__ import annotations
+import contextlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import URL, Engine, make_url
+from sqlalchemy.orm import Session, sessionmaker
+
+from .context import _tenant
+from .database import Database
+
+logger = logging.getLogger(__name__)
+
+# the features bound to a single engine or shared by all the tenants
+UNSUPPORTED_OPTIONS = ("replica_urls", "cache_backend", "pool_metrics", "profile_queries", "slow_query_threshold",
+                       "explain_slow_queries")
+
+
+class TenantDatabase(Database):
+    def __init__(self, url_factory: Callable[[str], URL | str], max_connections=100, autoflush=False,
+                 autocommit=False, query_cache=False, **engine_options):
+        """
+        Database object which resolves the engine from the tenant of the current context.
+        The engines are created on first use and kept in a LRU, the least recently used engines are
+        disposed once the pooled connections of all the engines exceed max_connections.
+
+        :param url_factory: A callable which returns the url of the database of a tenant
+        :param max_connections: The maximum number of pooled connections of all the engines
+        :param autoflush: Autoflush option of the session
+        :param autocommit: Autocommit option of the session
+        :param query_cache: Cache the results of the SELECT statements within each session
+        :param engine_options: Sqlalchemy engine parameters, shared by the engines of all the tenants.
+            The replicas, the second level cache, the pool metrics, the profiler and the slow query log aren't
+            supported and raise a ValueError
+        """
+        for option in UNSUPPORTED_OPTIONS:
+            if option in engine_options:
+                raise ValueError(f"The option {option} isn't supported by the TenantDatabase")
+        self.url_factory = url_factory
+        self.max_connections = max_connections
+        self._engines: OrderedDict[str, Engine] = OrderedDict()
+        self._lock = threading.Lock()
+        super().__init__(None, autoflush=autoflush, autocommit=autocommit, query_cache=query_cache, **engine_options)
+
+    def _create_engines(self, url, replica_urls, engine_options: dict):
+        # the engines are created by get_engine
+        self.engine_options = engine_options
+        self.replicas = []
+        self._connections_per_engine = engine_options.get("pool_size", 5) + engine_options.get("max_overflow", 10)
+
+    def _create_session_factory(self, autoflush: bool, autocommit: bool, replica_strategy: str) -> sessionmaker:
+        return sessionmaker(autoflush=autoflush, autocommit=autocommit)
+
+    @property
+    def tenant(self) -> str:
+        tenant = _tenant.get()
+        assert tenant is not None, "Make sure to use the database within a tenant context"
+        return tenant
+
+    @property
+    def url(self) -> URL:
+        return make_url(self.url_factory(self.tenant))
+
+    @property
+    def engine(self) -> Engine:
+        return self.get_engine(self.tenant)
+
+    def get_engine(self, tenant: str) -> Engine:
+        """
+        Return the engine of a tenant, the engine is created if it's not in the LRU.
+
+        :param tenant: The tenant key
+        """
+        with self._lock:
+            engine = self._engines.get(tenant)
+            if engine is not None:
+                self._engines.move_to_end(tenant)
+                return engine
+            engine = create_engine(make_url(self.url_factory(tenant)), **self.engine_options)
+            self._engines[tenant] = engine
+            while len(self._engines) > 1 and \
+                    len(self._engines) * self._connections_per_engine > self.max_connections:
+                evicted_tenant, evicted_engine = self._engines.popitem(last=False)
+                evicted_engine.dispose()
+                logger.debug(f"Engine of the tenant {evicted_tenant} disposed")
+            return engine
+
+    def dispose(self):
+        """
+        Dispose all the engines.
+        """
+        with self._lock:
+            while self._engines:
+                self._engines.popitem()[1].dispose()
+
+    def _create_session(self) -> Session:
+        return self._session_factory(bind=self.engine)
+
+    @contextlib.contextmanager
+    def tenant_ctx(self, tenant: str):
+        """
+        Set the tenant of the current context.
+
+        :param tenant: The tenant key
+        """
+        token = _tenant.set(tenant)
+        try:
+            yield
+        finally:
+            _tenant.reset(token)
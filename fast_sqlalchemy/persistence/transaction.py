@@ -0,0 +1,145 @@
+from __future__ import annotations
+import asyncio, functools, inspect, logging, random, threading, time
+from collections import Counter
+from typing import Callable, Optional, TYPE_CHECKING
+
+from sqlalchemy.exc import DBAPIError
+
+if TYPE_CHECKING:
+    from .database import Database
+
+logger = logging.getLogger(__name__)
+
+# SQLSTATE of the serialization failures, deadlocks and lock timeouts
+POSTGRESQL_RETRYABLE_CODES = {"40001", "40P01", "55P03"}
+# deadlocks and lock wait timeouts
+MYSQL_RETRYABLE_CODES = {1213, 1205}
+MSSQL_RETRYABLE_CODES = {1205}
+SQLITE_RETRYABLE_MESSAGES = ("database is locked", "database table is locked")
+
+
+def retryable_error_code(error: BaseException, dialect_name: str) -> Optional[str]:
+    """
+    Return the code of a driver error which can succeed once re-run, like a deadlock or a serialization
+    failure, None if the error isn't retryable.
+
+    :param error: The raised error
+    :param dialect_name: The name of the dialect of the engine, ex: 'postgresql'
+    """
+    if not isinstance(error, DBAPIError) or error.connection_invalidated:
+        return None
+    orig = error.orig
+    if dialect_name == "postgresql":
+        code = getattr(orig, "pgcode", None) or getattr(orig, "sqlstate", None)
+        return code if code in POSTGRESQL_RETRYABLE_CODES else None
+    if dialect_name in ("mysql", "mariadb", "mssql"):
+        code = orig.args[0] if orig is not None and orig.args else None
+        codes = MSSQL_RETRYABLE_CODES if dialect_name == "mssql" else MYSQL_RETRYABLE_CODES
+        return str(code) if code in codes else None
+    if dialect_name == "sqlite":
+        return next((locked for locked in SQLITE_RETRYABLE_MESSAGES if locked in str(orig)), None)
+    return None
+
+
+class TransactionMetrics:
+    """
+    Retries of the transactions run by Database.transaction.
+    """
+
+    def __init__(self):
+        self.attempts = 0
+        self.retries = 0
+        self.exhausted = 0
+        self.errors: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    def stats(self) -> dict:
+        return {"attempts": self.attempts, "retries": self.retries, "exhausted": self.exhausted,
+                "errors": dict(self.errors)}
+
+
+class Transaction:
+    def __init__(self, db: Database, retries=0, backoff=0.05, max_backoff=2.0):
+        """
+        Run a unit of work in a SAVEPOINT when the session of the context is in a transaction, otherwise in a
+        fresh transaction committed at the end. Used as a decorator, the function is re-run after a retryable
+        error with a jittered exponential backoff.
+        Serialization failures can only succeed in a fresh transaction, retrying them in a SAVEPOINT fails again.
+
+        :param db: The database object
+        :param retries: The maximum number of re-runs, only supported by the decorator
+        :param backoff: The base delay in seconds, the delay of the nth retry is a random value
+            between 0 and backoff * 2 ** n
+        :param max_backoff: The maximum delay in seconds
+        """
+        self.db = db
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._transactions = []
+
+    def __enter__(self):
+        assert not self.retries, "Retries need the decorator form, a with block can't be re-run"
+        transaction = self._begin()
+        self._transactions.append(transaction)
+        return transaction.__enter__()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return self._transactions.pop().__exit__(exc_type, exc_val, exc_tb)
+
+    def __call__(self, func: Callable):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                for attempt in range(self.retries + 1):
+                    try:
+                        return await self._run_async(func, args, kwargs)
+                    except DBAPIError as e:
+                        if (delay := self._retry_delay(e, attempt)) is None:
+                            raise
+                    await asyncio.sleep(delay)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(self.retries + 1):
+                try:
+                    return self._run(func, args, kwargs)
+                except DBAPIError as e:
+                    if (delay := self._retry_delay(e, attempt)) is None:
+                        raise
+                time.sleep(delay)
+        return wrapper
+
+    def _begin(self):
+        session = self.db.session
+        with self.db.transaction_metrics._lock:
+            self.db.transaction_metrics.attempts += 1
+        return session.begin_nested() if session.in_transaction() else session.begin()
+
+    def _run(self, func: Callable, args, kwargs):
+        with self._begin():
+            return func(*args, **kwargs)
+
+    async def _run_async(self, func: Callable, args, kwargs):
+        with self._begin():
+            return await func(*args, **kwargs)
+
+    def _retry_delay(self, error: DBAPIError, attempt: int) -> Optional[float]:
+        # None when the error isn't retryable or the retries are exhausted
+        metrics = self.db.transaction_metrics
+        code = retryable_error_code(error, self.db.engine.dialect.name)
+        if code is None:
+            return None
+        with metrics._lock:
+            metrics.errors[code] += 1
+            if attempt >= self.retries:
+                metrics.exhausted += 1
+            else:
+                metrics.retries += 1
+        if attempt >= self.retries:
+            return None
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        logger.warning(f"Retryable error {code}, retrying the transaction in {delay:.3f}s "
+                       f"({attempt + 1}/{self.retries})")
+        return delay
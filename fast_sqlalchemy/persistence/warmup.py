@@ -0,0 +1,121 @@
+from __future__ import annotations
+import importlib, threading
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple, Union
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql import Executable, compiler
+
+QueryBuilder = Callable[[], Union[Executable, Tuple[Executable, dict]]]
+
+
+class QueryRegistry:
+    """
+    Query builders whose statements are compiled by Database.warmup, a builder takes no argument and returns
+    a statement or a tuple (statement, parameters) when the statement is executed with parameters.
+    """
+
+    def __init__(self):
+        self.builders: List[QueryBuilder] = []
+
+    def __len__(self):
+        return len(self.builders)
+
+    def register(self, builder: QueryBuilder) -> QueryBuilder:
+        """
+        Register a query builder, usable as a decorator.
+        """
+        self.builders.append(builder)
+        return builder
+
+
+def compile_statement(engine: Engine, stmt: Executable, parameters: Optional[dict] = None) -> bool:
+    """
+    Compile a statement into the compiled cache of the engine with the same cache key as its execution.
+    Return whether the statement was already cached.
+
+    :param engine: The engine which will execute the statement
+    :param stmt: The statement
+    :param parameters: The parameters the statement is executed with
+    """
+    _, _, cache_hit = stmt._compile_w_cache(
+        dialect=engine.dialect,
+        compiled_cache=engine._compiled_cache,
+        column_keys=sorted(parameters or ()),
+        for_executemany=False,
+        schema_translate_map=None,
+        linting=engine.dialect.compiler_linting | compiler.WARN_LINTING,
+    )
+    return cache_hit == CACHE_HIT
+
+
+def open_connections(engine: Engine, connections: Optional[int] = None) -> int:
+    """
+    Open connections at once and check them back into the pool, return the number of opened connections.
+
+    :param engine: The engine
+    :param connections: The number of connections, defaults to the size of a QueuePool, 1 otherwise
+    """
+    if connections is None:
+        connections = engine.pool.size() if isinstance(engine.pool, QueuePool) else 1
+    opened = [engine.connect() for _ in range(connections)]
+    for connection in opened:
+        connection.close()
+    return connections
+
+
+class CompiledCacheStats:
+    def __init__(self, engines: Iterable[Engine]):
+        """
+        Count the compiled cache hits and misses of the statements executed by the engines.
+
+        :param engines: The engines to watch
+        """
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        for engine in engines:
+            event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is None or context.cache_hit not in (CACHE_HIT, CACHE_MISS):
+            return
+        with self._lock:
+            if context.cache_hit == CACHE_HIT:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_ratio": self.hits / total if total else 0.0}
+
+
+def warmup(engines: Sequence[Engine], registry: QueryRegistry, modules: Iterable[str] = (),
+           connections: Optional[int] = None) -> dict:
+    """
+    Import the modules which register query builders, compile the registered statements for every engine and
+    open the pooled connections, see Database.warmup.
+    """
+    for module in modules:
+        importlib.import_module(module)
+    compiled = already_cached = opened = 0
+    for builder in registry.builders:
+        built = builder()
+        stmt, parameters = built if isinstance(built, tuple) else (built, None)
+        for engine in engines:
+            if compile_statement(engine, stmt, parameters):
+                already_cached += 1
+            else:
+                compiled += 1
+    for engine in engines:
+        opened += open_connections(engine, connections)
+    return {
+        "compiled": compiled,
+        "already_cached": already_cached,
+        "connections": opened,
+        "compiled_cache_size": sum(len(engine._compiled_cache) for engine in engines
+                                   if engine._compiled_cache is not None),
+    }
@@ -1 +1,2 @@
 from .db_client import TestDatabase
+from .queries import query_budget
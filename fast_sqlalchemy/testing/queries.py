@@ -0,0 +1,28 @@
+from __future__ import annotations
+import contextlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from fast_sqlalchemy.persistence.database import Database
+
+
+@contextlib.contextmanager
+def query_budget(db: Database, max_queries: int):
+    """
+    Fail the test if more than max_queries statements are executed within the context.
+    The statements are counted in every thread, so that the requests of a test client are included.
+
+    :param db: The Database object created with profile_queries=True
+    :param max_queries: The maximum number of statements
+
+    **Example**:
+
+    >>> with query_budget(db, 3):
+    ...     client.get("/users")
+    """
+    assert db.profiler is not None, "Make sure to create the database with profile_queries=True"
+    with db.profiler.capture() as stats:
+        yield stats
+    if stats.count > max_queries:
+        statements = "\n".join(f"{count}x {statement}" for statement, count in stats.statements.most_common())
+        raise AssertionError(f"{stats.count} queries executed, the budget is {max_queries}:\n{statements}")
@@ -1,8 +1,9 @@
-import pytest, asyncio
+import pytest, asyncio, threading
+from contextvars import ContextVar
 from pytest_mock import MockerFixture
 
 from fast_sqlalchemy.event_bus.contexts import _event_queue, event_queue_ctx
-from fast_sqlalchemy.event_bus.bus import LocalEventBus
+from fast_sqlalchemy.event_bus.bus import LocalEventBus, EventHandlingError
 from fast_sqlalchemy.event_bus.emit import emit, publish_events
 
 
@@ -53,6 +54,7 @@ def test_handler_with_multiple_events(mocker: MockerFixture):
 
 @pytest.mark.asyncio
 async def test_event_queue(mocker: MockerFixture, event_bus_store_ctx):
+    # the sync handlers are called in the order of the events
     event_bus = LocalEventBus()
     handler = mocker.Mock(__name__="handler", __annotations__={})
 
@@ -142,3 +144,180 @@ def test_error_if_coroutine_use_as_handler():
         @event_bus.handler(CustomEvent)
         async def handler(e):
             pass
+
+
+@pytest.mark.asyncio
+async def test_bounded_concurrency():
+    event_bus = LocalEventBus(max_concurrency=3)
+    running, max_running = 0, 0
+    class CustomEvent:
+        pass
+
+    @event_bus.handler(CustomEvent, on_publish=True)
+    async def handler(e):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0)
+        running -= 1
+
+    await event_bus.async_handle_events([CustomEvent() for _ in range(50)])
+    assert max_running == 3
+
+@pytest.mark.asyncio
+async def test_failing_handlers_dont_stop_the_others(caplog):
+    event_bus = LocalEventBus(handler_timeout=0.01)
+    handled = []
+    class CustomEvent:
+        pass
+
+    @event_bus.handler(CustomEvent, on_publish=True)
+    async def failing_handler(e):
+        raise RuntimeError
+
+    @event_bus.handler(CustomEvent, on_publish=True)
+    async def slow_handler(e):
+        await asyncio.sleep(1)
+
+    @event_bus.handler(CustomEvent, on_publish=True)
+    def sync_handler(e):
+        handled.append(e)
+
+    event = CustomEvent()
+    with pytest.raises(EventHandlingError) as error:
+        await event_bus.async_handle_events([event])
+    assert handled == [event]
+    assert [record.levelname for record in caplog.records] == ["ERROR", "ERROR"]
+    assert {type(e) for _, _, e in error.value.failures} == {RuntimeError, asyncio.TimeoutError}
+
+@pytest.mark.asyncio
+async def test_sync_handler_runs_in_thread_pool_with_context():
+    event_bus = LocalEventBus(max_workers=1)
+    var = ContextVar("var")
+    calls = []
+    class CustomEvent:
+        pass
+
+    @event_bus.handler(CustomEvent, on_publish=True)
+    def handler(e):
+        calls.append((threading.current_thread().name, var.get()))
+
+    var.set("request")
+    await event_bus.async_handle_events([CustomEvent()])
+    event_bus.shutdown()
+    (thread_name, value), = calls
+    assert thread_name.startswith("event-bus") and value == "request"
+
+@pytest.mark.asyncio
+async def test_sync_handlers_run_one_after_another():
+    # the sync handlers share the session of the publish, they must not run at the same time
+    event_bus = LocalEventBus(max_workers=8)
+    running, overlaps = [], []
+    class CustomEvent:
+        pass
+
+    def handler(e):
+        running.append(e)
+        overlaps.append(len(running) > 1)
+        threading.Event().wait(0.005)
+        running.remove(e)
+
+    for _ in range(8):
+        # distinct functions, the same function is only called once per event
+        event_bus.subscribe(CustomEvent, lambda e: handler(e), on_publish=True)
+    await event_bus.async_handle_events([CustomEvent(), CustomEvent()])
+    event_bus.shutdown()
+    assert len(overlaps) == 16 and not any(overlaps)
+
+@pytest.mark.asyncio
+async def test_parent_type_handlers(mocker: MockerFixture):
+    event_bus = LocalEventBus()
+    parent_handler = mocker.MagicMock(__name__="parent_handler")
+    publish_handler = mocker.AsyncMock(__name__="publish_handler")
+    class ParentEvent:
+        pass
+
+    class ChildEvent(ParentEvent):
+        pass
+
+    event_bus.subscribe(ParentEvent, parent_handler)
+    event_bus.subscribe([ParentEvent, ChildEvent], publish_handler, on_publish=True)
+    event = ChildEvent()
+    event_bus.handle_event(event)
+    parent_handler.assert_called_once_with(event)
+    await event_bus.async_handle_events([event])
+    publish_handler.assert_awaited_once_with(event)
+
+def test_dispatch_table_invalidation(mocker: MockerFixture):
+    event_bus = LocalEventBus()
+    handler = mocker.MagicMock(__name__="handler")
+    class CustomEvent:
+        pass
+
+    class UnknownEvent:
+        pass
+
+    event_bus.handle_event(CustomEvent())
+    event_bus.subscribe(CustomEvent, handler)
+    event_bus.handle_event(CustomEvent())
+    assert handler.call_count == 1
+    event_bus.unsubscribe(CustomEvent, handler)
+    event_bus.handle_event(CustomEvent())
+    assert handler.call_count == 1
+    event_bus.handle_event(UnknownEvent())
+    assert UnknownEvent not in event_bus.event_handlers
+
+@pytest.mark.asyncio
+async def test_batch_handler():
+    event_bus = LocalEventBus()
+    batches = []
+    class EmailChanged:
+        def __init__(self, user_id, email):
+            self.user_id, self.email = user_id, email
+
+    class UserDeleted:
+        def __init__(self, user_id):
+            self.user_id = user_id
+
+    @event_bus.batch_handler(EmailChanged, UserDeleted, max_batch=2, key=lambda e: e.user_id)
+    async def index_users(events):
+        batches.append([(e.user_id, getattr(e, "email", None)) for e in events])
+
+    await event_bus.async_handle_events([EmailChanged(1, "a"), EmailChanged(2, "b"), EmailChanged(1, "c"),
+                                         UserDeleted(3)])
+    assert batches == [[(2, "b"), (1, "c")], [(3, None)]]
+
+@pytest.mark.asyncio
+async def test_batch_handler_without_key(mocker: MockerFixture):
+    event_bus = LocalEventBus()
+    handler = mocker.MagicMock(__name__="handler")
+    class CustomEvent:
+        pass
+
+    event_bus.batch_handler(CustomEvent)(handler)
+    events = [CustomEvent(), CustomEvent()]
+    await event_bus.async_handle_events(events)
+    handler.assert_called_once_with(events)
+    event_bus.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_coroutine_handlers_order():
+    event_bus = LocalEventBus()
+    handled = []
+    class CustomEvent:
+        def __init__(self, delay):
+            self.delay = delay
+
+    @event_bus.handler(CustomEvent, on_publish=True)
+    async def handler(e):
+        await asyncio.sleep(e.delay)
+        handled.append(e.delay)
+
+    await event_bus.async_handle_events([CustomEvent(0.02), CustomEvent(0)])
+    assert handled == [0, 0.02]
+    handled.clear()
+    # a single coroutine at a time keeps the order of the events
+    event_bus.max_concurrency = 1
+    await event_bus.async_handle_events([CustomEvent(0.02), CustomEvent(0)])
+    assert handled == [0.02, 0]
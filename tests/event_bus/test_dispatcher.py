@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+from pytest_mock import MockerFixture
+
+from fast_sqlalchemy.event_bus.bus import LocalEventBus
+from fast_sqlalchemy.event_bus.dispatcher import EventDispatcher
+from fast_sqlalchemy.event_bus.middlewares import EventBusMiddleware
+
+
+class CustomEvent:
+    pass
+
+
+@pytest.mark.asyncio
+async def test_dispatch_events_out_of_the_request(event_bus_store_ctx):
+    event_bus = LocalEventBus()
+    handled = []
+
+    @event_bus.handler(CustomEvent, on_publish=True)
+    async def handler(e):
+        await asyncio.sleep(0.01)
+        handled.append(e)
+
+    dispatcher = EventDispatcher(workers=2)
+    with event_bus_store_ctx([event_bus]):
+        await dispatcher.start()
+        events = [CustomEvent(), CustomEvent()]
+        await dispatcher.submit(events[:1])
+        await dispatcher.submit(events[1:])
+        assert handled == []
+        await dispatcher.stop()
+    assert sorted(map(id, handled)) == sorted(map(id, events))
+    assert not dispatcher.running
+    assert dispatcher.stats()["dispatched"] == 2
+
+
+@pytest.mark.asyncio
+async def test_backpressure(event_bus_store_ctx):
+    event_bus = LocalEventBus()
+    release = asyncio.Event()
+
+    @event_bus.handler(CustomEvent, on_publish=True)
+    async def handler(e):
+        await release.wait()
+
+    dispatcher = EventDispatcher(workers=1, max_size=2)
+    with event_bus_store_ctx([event_bus]):
+        # the worker takes the first batch while the third one waits for a free slot
+        for _ in range(3):
+            await dispatcher.submit([CustomEvent()])
+        assert dispatcher.waits == 1
+        blocked = asyncio.create_task(dispatcher.submit([CustomEvent()]))
+        await asyncio.sleep(0)
+        assert not blocked.done()
+        release.set()
+        await blocked
+        await dispatcher.stop()
+    stats = dispatcher.stats()
+    assert stats["high_water_mark"] == 2 and stats["waits"] == 2 and stats["dispatched"] == 4
+
+
+@pytest.mark.asyncio
+async def test_acknowledge_dispatched_events(mocker: MockerFixture, event_bus_store_ctx):
+    on_dispatched = mocker.AsyncMock()
+    event_bus = LocalEventBus()
+    failed, dispatched = [CustomEvent()], [CustomEvent()]
+
+    @event_bus.handler(CustomEvent, on_publish=True)
+    def handler(e):
+        if e is failed[0]:
+            raise RuntimeError("webhook down")
+
+    dispatcher = EventDispatcher(workers=1, on_dispatched=on_dispatched)
+    with event_bus_store_ctx([event_bus]):
+        await dispatcher.submit(failed)
+        await dispatcher.submit(dispatched)
+        await dispatcher.stop()
+    on_dispatched.assert_awaited_once_with(dispatched)
+    assert dispatcher.stats()["failed"] == 1 and dispatcher.stats()["dispatched"] == 1
+
+
+@pytest.mark.asyncio
+async def test_middleware_submits_to_the_dispatcher(mocker: MockerFixture, event_bus_store_ctx):
+    publish_mock = mocker.patch("fast_sqlalchemy.event_bus.middlewares.publish_events")
+    dispatcher = mocker.AsyncMock()
+    response = mocker.MagicMock(status_code=201)
+    with event_bus_store_ctx():
+        middleware = EventBusMiddleware(mocker.Mock(), [mocker.AsyncMock()], dispatcher=dispatcher)
+        await middleware.dispatch(mocker.MagicMock(), mocker.AsyncMock(return_value=response))
+    dispatcher.submit.assert_awaited_once()
+    publish_mock.assert_not_called()
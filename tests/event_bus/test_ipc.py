@@ -0,0 +1,67 @@
+import asyncio
+from dataclasses import dataclass
+
+import pytest
+
+from fast_sqlalchemy.event_bus.bus import LocalEventBus
+from fast_sqlalchemy.event_bus.ipc import IPCEventBus
+
+
+@dataclass
+class CacheInvalidated:
+    key: str
+
+
+@dataclass
+class UserViewed:
+    key: str
+
+
+async def wait_for(predicate, timeout=2.0):
+    async def poll():
+        while not predicate():
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(poll(), timeout)
+
+
+@pytest.fixture()
+def directory(tmp_path):
+    return str(tmp_path / "events")
+
+
+@pytest.mark.asyncio
+async def test_broadcast_to_the_other_processes(directory):
+    received = {"a": [], "b": []}
+    buses = []
+    for name in received:
+        bus = LocalEventBus()
+        bus.subscribe(CacheInvalidated, received[name].append, on_publish=True)
+        buses.append(IPCEventBus(bus, directory, name=name))
+    ipc_a, ipc_b = buses
+    await ipc_a.start()
+    await ipc_b.start()
+    try:
+        await ipc_a.async_handle_events([CacheInvalidated("users"), UserViewed("bob"), CacheInvalidated("plans")])
+        await wait_for(lambda: len(received["b"]) == 2)
+        assert received == {"a": [CacheInvalidated("users"), CacheInvalidated("plans")],
+                            "b": [CacheInvalidated("users"), CacheInvalidated("plans")]}
+    finally:
+        await ipc_a.stop()
+        await ipc_b.stop()
+
+
+@pytest.mark.asyncio
+async def test_ignore_stopped_processes(directory):
+    received = []
+    bus = LocalEventBus()
+    bus.subscribe(CacheInvalidated, received.append, on_publish=True)
+    ipc_a, ipc_b = IPCEventBus(bus, directory, name="a"), IPCEventBus(LocalEventBus(), directory, name="b")
+    await ipc_a.start()
+    await ipc_b.start()
+    await ipc_b.stop()
+    open(f"{directory}/stale.sock", "w").close()
+    try:
+        await ipc_a.async_handle_events([CacheInvalidated("users")])
+    finally:
+        await ipc_a.stop()
+    assert received == [CacheInvalidated("users")]
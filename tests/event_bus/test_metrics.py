@@ -0,0 +1,100 @@
+import subprocess, sys
+
+import pytest
+from pytest_mock import MockerFixture
+
+from fast_sqlalchemy.event_bus.bus import LocalEventBus, EventHandlingError
+from fast_sqlalchemy.event_bus.contexts import event_queue_ctx
+from fast_sqlalchemy.event_bus.dispatcher import EventDispatcher
+from fast_sqlalchemy.event_bus.emit import emit, publish_events
+from fast_sqlalchemy.event_bus.metrics import MemoryMetrics, EventBusMetrics, add_metrics, remove_metrics
+
+
+class UserCreated:
+    pass
+
+
+class UserDeleted:
+    pass
+
+
+@pytest.fixture()
+def metrics():
+    metrics = MemoryMetrics()
+    add_metrics(metrics)
+    yield metrics
+    remove_metrics(metrics)
+
+
+@pytest.mark.asyncio
+async def test_event_bus_metrics(metrics, event_bus_store_ctx):
+    event_bus = LocalEventBus()
+
+    @event_bus.handler(UserCreated)
+    def on_created(e):
+        pass
+
+    @event_bus.handler(UserCreated, UserDeleted, on_publish=True)
+    async def on_publish(e):
+        if isinstance(e, UserDeleted):
+            raise RuntimeError
+
+    with event_bus_store_ctx([event_bus]), event_queue_ctx():
+        emit(UserCreated())
+        emit(UserCreated())
+        emit(UserDeleted())
+        with pytest.raises(EventHandlingError):
+            await publish_events()
+    stats = metrics.stats()
+    assert stats["emitted"] == {"UserCreated": 2, "UserDeleted": 1}
+    assert stats["published"] == {"UserCreated": 2, "UserDeleted": 1}
+    handler = "test_event_bus_metrics.<locals>.on_publish"
+    assert stats["handlers"][handler]["calls"] == 3
+    assert stats["handlers"][handler]["errors"] == 1
+    assert stats["handlers"][handler]["duration"]["buckets"]["+Inf"] == 3
+    assert stats["handlers"]["test_event_bus_metrics.<locals>.on_created"]["calls"] == 2
+    assert stats["max_request_events"] == 3
+
+
+@pytest.mark.asyncio
+async def test_custom_metrics_hooks(mocker: MockerFixture):
+    hooks = mocker.MagicMock(spec=EventBusMetrics)
+    add_metrics(hooks)
+    event_bus = LocalEventBus()
+    try:
+        event_bus.batch_handler(UserCreated)(mocker.AsyncMock(__qualname__="index"))
+        await event_bus.async_handle_events([UserCreated(), UserCreated()])
+    finally:
+        remove_metrics(hooks)
+    name, event_type, duration, error = hooks.on_handler.call_args.args
+    assert (name, event_type, error) == ("index", UserCreated, None)
+
+
+@pytest.mark.asyncio
+async def test_dispatched_events_are_counted_as_published(metrics, event_bus_store_ctx):
+    event_bus = LocalEventBus()
+    event_bus.subscribe(UserCreated, lambda e: None, on_publish=True)
+    dispatcher = EventDispatcher(workers=1)
+    with event_bus_store_ctx([event_bus]):
+        await dispatcher.submit([UserCreated(), UserCreated()])
+        await dispatcher.stop()
+    event_bus.shutdown()
+    assert metrics.stats()["published"] == {"UserCreated": 2}
+
+
+def test_emit_doesnt_format_the_event_without_debug_logs():
+    formatted = []
+    class Event:
+        def __str__(self):
+            formatted.append(self)
+            return "event"
+        __repr__ = __str__
+
+    with event_queue_ctx():
+        emit(Event())
+    assert formatted == []
+
+
+def test_event_bus_doesnt_import_the_persistence():
+    code = "import sys, fast_sqlalchemy.event_bus.metrics; print('sqlalchemy' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", code], capture_output=True, text=True).stdout.strip() == "False"
@@ -3,6 +3,7 @@ from pytest_mock import MockerFixture
 
 from fast_sqlalchemy.event_bus.bus import LocalEventBus
 from fast_sqlalchemy.event_bus.contexts import event_bus_store
+from fast_sqlalchemy.event_bus.emit import emit
 from fast_sqlalchemy.event_bus.middlewares import EventBusMiddleware
 
 
@@ -37,3 +38,24 @@ async def test_publish_not_call_if_status_is_above_400(mocker: MockerFixture, ev
         await middleware.dispatch(mocker.MagicMock(), mocker.AsyncMock(return_value=response))
         publish_mock.assert_not_called()
 
+
+
+@pytest.mark.asyncio
+async def test_failed_handlers_dont_fail_the_request(mocker: MockerFixture, event_bus_store_ctx):
+    event_bus = LocalEventBus()
+    response = mocker.MagicMock(status_code=200)
+
+    class CustomEvent:
+        pass
+
+    @event_bus.handler(CustomEvent, on_publish=True)
+    async def failing_handler(e):
+        raise RuntimeError
+
+    async def call_next(request):
+        emit(CustomEvent())
+        return response
+
+    with event_bus_store_ctx():
+        middleware = EventBusMiddleware(mocker.Mock(), [event_bus])
+        assert await middleware.dispatch(mocker.MagicMock(), call_next) is response
@@ -0,0 +1,149 @@
+import threading
+from dataclasses import dataclass
+
+import pytest
+from pytest_mock import MockerFixture
+from sqlalchemy import MetaData, event, select
+from sqlalchemy.pool import StaticPool
+
+from fast_sqlalchemy.event_bus.bus import LocalEventBus
+from fast_sqlalchemy.event_bus.contexts import event_queue_ctx
+from fast_sqlalchemy.event_bus.emit import emit
+from fast_sqlalchemy.event_bus.outbox import OutboxEventBus, outbox_table
+from fast_sqlalchemy.persistence.database import Database
+
+
+@dataclass
+class UserCreated:
+    name: str
+
+
+@dataclass
+class UserViewed:
+    name: str
+
+
+@pytest.fixture()
+def db():
+    return Database("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+
+
+@pytest.fixture()
+def table(db):
+    table = outbox_table(MetaData())
+    table.create(db.engine)
+    return table
+
+
+@pytest.fixture()
+def bus():
+    return LocalEventBus()
+
+
+@pytest.fixture()
+def outbox(db, table, bus):
+    return OutboxEventBus(db, table, bus)
+
+
+def emit_in_transaction(db, outbox, event_bus_store_ctx, *events, commit=True):
+    with event_bus_store_ctx([outbox]), event_queue_ctx(), db.session_ctx():
+        for event in events:
+            emit(event)
+        if commit:
+            db.session.commit()
+
+
+def outbox_rows(db, table):
+    with db.session_ctx():
+        return db.session.execute(select(table.c.event_type, table.c.attempts, table.c.processed_at)).all()
+
+
+@pytest.mark.asyncio
+async def test_relay_committed_events(db, table, bus, outbox, event_bus_store_ctx):
+    handled = []
+    bus.subscribe(UserCreated, lambda e: handled.append(("sync", e)))
+
+    @bus.handler(UserCreated, on_publish=True)
+    async def handler(e):
+        handled.append(("publish", e))
+
+    emit_in_transaction(db, outbox, event_bus_store_ctx, UserCreated("bob"))
+    assert handled == [("sync", UserCreated("bob"))]
+    (event_type, attempts, processed_at), = outbox_rows(db, table)
+    assert event_type.endswith("UserCreated") and processed_at is None
+    assert await outbox.relay().relay_batch() == 1
+    assert handled[1] == ("publish", UserCreated("bob"))
+    (_, attempts, processed_at), = outbox_rows(db, table)
+    assert attempts == 1 and processed_at is not None
+    assert await outbox.relay().relay_batch() == 0
+
+
+def test_rolled_back_events_are_not_stored(db, table, bus, outbox, event_bus_store_ctx):
+    bus.subscribe(UserCreated, lambda e: None, on_publish=True)
+    emit_in_transaction(db, outbox, event_bus_store_ctx, UserCreated("bob"), commit=False)
+    assert outbox_rows(db, table) == []
+
+
+def test_store_only_events_with_publish_handlers(db, table, bus, outbox, event_bus_store_ctx):
+    bus.subscribe(UserCreated, lambda e: None, on_publish=True)
+    bus.subscribe(UserViewed, lambda e: None)
+    emit_in_transaction(db, outbox, event_bus_store_ctx, UserCreated("bob"), UserViewed("bob"))
+    assert len(outbox_rows(db, table)) == 1
+
+
+@pytest.mark.asyncio
+async def test_relay_by_batches(db, table, bus, outbox, event_bus_store_ctx, mocker: MockerFixture):
+    bus.subscribe(UserCreated, lambda e: None, on_publish=True)
+    handle_events = mocker.patch.object(bus, "async_handle_events")
+    emit_in_transaction(db, outbox, event_bus_store_ctx, *[UserCreated(str(i)) for i in range(5)])
+    relay = outbox.relay(batch_size=2)
+    assert [await relay.relay_batch() for _ in range(4)] == [2, 2, 1, 0]
+    assert [len(call.args[0]) for call in handle_events.call_args_list] == [2, 2, 1]
+
+
+@pytest.mark.asyncio
+async def test_events_with_failed_handlers_are_retried(db, table, bus, outbox, event_bus_store_ctx):
+    calls = []
+
+    @bus.handler(UserCreated, on_publish=True)
+    def webhook(e):
+        calls.append(e)
+        if len(calls) == 1:
+            raise RuntimeError("webhook down")
+
+    emit_in_transaction(db, outbox, event_bus_store_ctx, UserCreated("bob"))
+    relay = outbox.relay()
+    assert await relay.relay_batch() == 1
+    (_, attempts, processed_at), = outbox_rows(db, table)
+    assert attempts == 1 and processed_at is None
+    assert await relay.relay_batch() == 1
+    await relay.stop()
+    (_, attempts, processed_at), = outbox_rows(db, table)
+    assert attempts == 2 and processed_at is not None
+    assert calls == [UserCreated("bob"), UserCreated("bob")]
+
+
+@pytest.mark.asyncio
+async def test_relay_queries_dont_block_the_event_loop(db, table, bus, outbox, event_bus_store_ctx):
+    threads = set()
+    event.listen(db.engine, "before_cursor_execute", lambda *args: threads.add(threading.current_thread().name))
+    bus.subscribe(UserCreated, lambda e: None, on_publish=True)
+    emit_in_transaction(db, outbox, event_bus_store_ctx, UserCreated("bob"))
+    threads.clear()
+    relay = outbox.relay()
+    assert [await relay.relay_batch() for _ in range(2)] == [1, 0]
+    await relay.stop()
+    assert len(threads) == 1 and threads.pop().startswith("outbox-relay")
+
+
+@pytest.mark.asyncio
+async def test_failed_events_are_retried(db, table, bus, event_bus_store_ctx):
+    def deserializer(payload):
+        raise ValueError
+    outbox = OutboxEventBus(db, table, bus, deserializer=deserializer)
+    bus.subscribe(UserCreated, lambda e: None, on_publish=True)
+    emit_in_transaction(db, outbox, event_bus_store_ctx, UserCreated("bob"))
+    relay = outbox.relay(max_attempts=2)
+    assert [await relay.relay_batch() for _ in range(3)] == [1, 1, 0]
+    (_, attempts, processed_at), = outbox_rows(db, table)
+    assert attempts == 2 and processed_at is None
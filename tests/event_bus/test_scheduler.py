@@ -0,0 +1,91 @@
+import asyncio, threading, time
+
+import pytest
+
+from fast_sqlalchemy.event_bus.bus import LocalEventBus
+from fast_sqlalchemy.event_bus.scheduler import EventScheduler
+
+
+class CustomEvent:
+    def __init__(self, value=None):
+        self.value = value
+
+
+@pytest.fixture
+def handled_bus(event_bus_store_ctx):
+    event_bus = LocalEventBus()
+    handled = []
+
+    @event_bus.handler(CustomEvent, on_publish=True)
+    async def handler(e):
+        handled.append(e.value)
+
+    with event_bus_store_ctx([event_bus]):
+        yield handled
+
+
+@pytest.mark.asyncio
+async def test_publish_events_after_their_delay(handled_bus):
+    scheduler = EventScheduler()
+    await scheduler.start()
+    scheduler.schedule(CustomEvent(2), delay=0.05)
+    scheduler.schedule(CustomEvent(1), delay=0.01)
+    await asyncio.sleep(0.02)
+    assert handled_bus == [1]
+    await asyncio.sleep(0.05)
+    assert handled_bus == [1, 2]
+    assert len(scheduler) == 0
+    await scheduler.stop()
+
+
+@pytest.mark.asyncio
+async def test_dedupe_key_supersedes_pending_event(handled_bus):
+    scheduler = EventScheduler()
+    await scheduler.start()
+    scheduler.schedule(CustomEvent(1), delay=0.02, dedupe_key="user:1")
+    scheduler.schedule(CustomEvent(2), delay=0.03, dedupe_key="user:1")
+    scheduler.schedule(CustomEvent(3), delay=0.01, dedupe_key="user:2")
+    assert len(scheduler) == 2
+    assert scheduler.cancel("user:2")
+    assert not scheduler.cancel("user:2")
+    await asyncio.sleep(0.06)
+    assert handled_bus == [2]
+    await scheduler.stop()
+
+
+@pytest.mark.asyncio
+async def test_schedule_from_another_thread(handled_bus):
+    scheduler = EventScheduler()
+    await scheduler.start()
+    # the scheduler is asleep until a timer which is far away
+    scheduler.schedule(CustomEvent(2), delay=60)
+    thread = threading.Thread(target=scheduler.schedule, args=(CustomEvent(1), 0.01))
+    thread.start()
+    thread.join()
+    await asyncio.sleep(0.05)
+    assert handled_bus == [1]
+    await scheduler.stop()
+    assert len(scheduler) == 0
+
+
+@pytest.mark.asyncio
+async def test_hold_many_pending_timers(handled_bus):
+    scheduler = EventScheduler()
+    await scheduler.start()
+    for i in range(100_000):
+        scheduler.schedule(CustomEvent(i), delay=60 + i % 10, dedupe_key=i)
+    for i in range(100_000):
+        scheduler.schedule(CustomEvent(i), delay=60, dedupe_key=i)
+    assert len(scheduler) == 100_000
+    # the superseded timers are compacted away
+    assert len(scheduler._heap) <= 150_000
+    start = time.process_time()
+    await asyncio.sleep(0.1)
+    assert time.process_time() - start < 0.05
+    await scheduler.stop()
+
+
+@pytest.mark.asyncio
+async def test_schedule_requires_start():
+    with pytest.raises(RuntimeError):
+        EventScheduler().schedule(CustomEvent(), delay=1)
@@ -1,11 +1,14 @@
+import logging, threading, time
 from logging import LogRecord
 
 import pytest
 from pytest_mock import MockerFixture
-from sqlalchemy import Table, MetaData, Column, String, select
+from sqlalchemy import Table, MetaData, Column, String, select, text
+from sqlalchemy.pool import StaticPool
 
-from fast_sqlalchemy.logging.handlers import DatabaseHandler
+from fast_sqlalchemy.logging.handlers import DatabaseHandler, QueuedDatabaseHandler
 from fast_sqlalchemy.persistence.database import Database
+from fast_sqlalchemy.persistence.slow_queries import ignore_slow_queries, map_slow_query, slow_query_table
 
 metadata = MetaData()
 
@@ -39,3 +42,88 @@ def test_db_handler(db, mocker: MockerFixture):
         assert logs[0].message == message
         assert logs[0].time == time
 
+
+
+@pytest.fixture()
+def threaded_db():
+    db = Database("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    metadata.create_all(db.engine)
+    return db
+
+
+def mapping_message(record: LogRecord):
+    return {"level": record.levelname, "time": str(record.created), "message": record.getMessage()}
+
+
+def make_record(message: str):
+    return logging.LogRecord("test", logging.INFO, __file__, 1, message, None, None)
+
+
+def count_logs(db: Database) -> int:
+    with db.session_ctx():
+        return len(db.session.execute(select(log_table)).all())
+
+
+def test_queued_db_handler_inserts_by_batches(threaded_db, mocker: MockerFixture):
+    handler = QueuedDatabaseHandler(threaded_db, log_table, mapping_message, batch_size=10, flush_interval=60)
+    insert = mocker.spy(handler, "_insert")
+    for i in range(25):
+        handler.emit(make_record(f"message {i}"))
+    # the last records wait for the flush interval or the close
+    time.sleep(0.1)
+    assert count_logs(threaded_db) == 20
+    handler.close()
+    assert count_logs(threaded_db) == 25
+    assert [len(call.args[0]) for call in insert.call_args_list] == [10, 10, 5]
+
+
+def test_queued_db_handler_flushes_after_interval(threaded_db):
+    handler = QueuedDatabaseHandler(threaded_db, log_table, mapping_message, flush_interval=0.05)
+    handler.emit(make_record("message"))
+    handler.flush()
+    assert count_logs(threaded_db) == 1
+    handler.close()
+
+
+@pytest.mark.parametrize("block, dropped", [(False, 2), (True, 0)])
+def test_queued_db_handler_full_queue(threaded_db, block, dropped):
+    handler = QueuedDatabaseHandler(threaded_db, log_table, mapping_message, flush_interval=0, max_queue_size=2,
+                                    block=block)
+    inserting, release = threading.Event(), threading.Event()
+    insert = handler._insert
+
+    def slow_insert(records):
+        inserting.set()
+        release.wait()
+        insert(records)
+
+    handler._insert = slow_insert
+    handler.emit(make_record("message 0"))
+    inserting.wait()
+    if block:
+        threading.Timer(0.05, release.set).start()
+    for i in range(1, 5):
+        handler.emit(make_record(f"message {i}"))
+    release.set()
+    handler.close()
+    assert handler.dropped == dropped
+    assert count_logs(threaded_db) == 5 - dropped
+
+
+def test_queued_db_handler_doesnt_log_its_slow_inserts():
+    db = Database("sqlite://", slow_query_threshold=0, poolclass=StaticPool,
+                  connect_args={"check_same_thread": False})
+    table = slow_query_table(MetaData())
+    table.create(db.engine)
+    handler = QueuedDatabaseHandler(db, table, map_slow_query, flush_interval=0)
+    slow_query_logger = logging.getLogger("fast_sqlalchemy.persistence.slow_queries")
+    slow_query_logger.addHandler(handler)
+    try:
+        with db.session_ctx():
+            db.session.execute(text("select 1"))
+        handler.flush()
+    finally:
+        slow_query_logger.removeHandler(handler)
+        handler.close()
+    with ignore_slow_queries(), db.session_ctx():
+        assert db.session.execute(select(table.c.sql)).scalars().all() == ["select 1"]
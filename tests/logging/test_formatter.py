@@ -0,0 +1,68 @@
+import json, sys
+import logging
+
+import pytest
+
+from fast_sqlalchemy.logging.context import _request_id
+from fast_sqlalchemy.logging.formatter import JSONFormatter, _json_dumps
+from fast_sqlalchemy.persistence.context import _query_stats, _route, _tenant
+from fast_sqlalchemy.persistence.profiler import QueryStats
+
+
+def make_record(msg="user %s created", args=(1,), exc_info=None, **extra):
+    record = logging.LogRecord("app.users", logging.INFO, __file__, 10, msg, args, exc_info)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_fields():
+    formatter = JSONFormatter(fields={"level": "levelname", "message": "message", "line": "lineno"},
+                              extras=["user_id", "missing"], dumps=_json_dumps)
+    record = make_record(user_id=1)
+    assert json.loads(formatter.format(record)) == {"level": "INFO", "message": "user 1 created", "line": 10,
+                                                    "user_id": 1}
+    # the record isn't modified
+    assert record.msg == "user %s created"
+    assert not hasattr(record, "message")
+
+
+def test_json_formatter_time():
+    record = make_record()
+    record.created, record.msecs = 0, 0
+    assert json.loads(JSONFormatter().format(record))["time"] == "1970-01-01T00:00:00.000+00:00"
+    assert json.loads(JSONFormatter(datefmt="%Y").format(record))["time"] in ("1969", "1970")
+
+
+def test_json_formatter_request_context():
+    stats = QueryStats()
+    stats.record("SELECT 1", 0.0021)
+    stats.record("SELECT 2", 0.001)
+    tokens = [(var, var.set(value)) for var, value in
+              ((_request_id, "abc"), (_route, "GET /users"), (_tenant, "acme"), (_query_stats, stats))]
+    try:
+        data = json.loads(JSONFormatter().format(make_record()))
+    finally:
+        for var, token in tokens:
+            var.reset(token)
+    assert data["request_id"] == "abc"
+    assert data["route"] == "GET /users"
+    assert data["tenant"] == "acme"
+    assert data["sql_queries"] == 2
+    assert data["sql_time_ms"] == 3.1
+    assert "request_id" not in json.loads(JSONFormatter().format(make_record()))
+    assert "request_id" not in json.loads(JSONFormatter(context=False).format(make_record()))
+
+
+def test_json_formatter_exception():
+    try:
+        raise ValueError("invalid")
+    except ValueError:
+        record = make_record(exc_info=sys.exc_info())
+    data = json.loads(JSONFormatter().format(record))
+    assert "ValueError: invalid" in data["exc_info"]
+
+
+@pytest.mark.parametrize("value", [object(), b"bytes"])
+def test_json_formatter_unserializable_values(value):
+    data = json.loads(JSONFormatter(extras=["value"]).format(make_record(value=value)))
+    assert data["value"] == str(value)
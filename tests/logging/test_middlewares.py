@@ -2,6 +2,7 @@ import time
 import pytest
 from pytest_mock import MockerFixture
 
+from fast_sqlalchemy.logging.context import _request_id
 from fast_sqlalchemy.logging.middlewares import RequestLoggingMiddleware
 
 
@@ -20,3 +21,19 @@ async def test_timing_middleware(caplog, mocker: MockerFixture):
     assert "1000.00ms" in caplog.text
     assert endpoint in caplog.text
     assert method in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_request_id(mocker: MockerFixture):
+    request_ids = []
+
+    async def call_next(request):
+        request_ids.append(_request_id.get())
+        return mocker.Mock(status_code=200)
+
+    middleware = RequestLoggingMiddleware(mocker.Mock())
+    await middleware.dispatch(mocker.Mock(headers={"x-request-id": "abc"}), call_next)
+    await middleware.dispatch(mocker.Mock(headers={}), call_next)
+    assert request_ids[0] == "abc"
+    assert len(request_ids[1]) == 32
+    assert _request_id.get() is None
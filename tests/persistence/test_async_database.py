@@ -0,0 +1,84 @@
+import os
+
+import pytest
+from pytest_mock import MockerFixture
+from sqlalchemy import text, insert, select, MetaData, Table, Column, Integer, String
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncEngine
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from fast_sqlalchemy.persistence.context import _async_session
+from fast_sqlalchemy.persistence.database import AsyncDatabase
+from fast_sqlalchemy.persistence.middlewares import AsyncDatabaseMiddleware, AsyncAutocommitMiddleware
+
+metadata = MetaData()
+
+users = Table("users", metadata,
+              Column("id", Integer, primary_key=True),
+              Column("name", String))
+
+
+@pytest.fixture()
+def db():
+    return AsyncDatabase("sqlite+aiosqlite://")
+
+
+def test_create_async_engine(db):
+    assert isinstance(db.engine, AsyncEngine)
+
+
+@pytest.mark.asyncio
+async def test_create_async_session_ctx(db):
+    assert _async_session.get() is None
+    async with db.async_session_ctx() as session:
+        assert isinstance(_async_session.get(), AsyncSession)
+        assert session == db.session
+        assert (await db.session.execute(text("select 1"))).scalar() == 1
+    assert _async_session.get() is None
+
+
+@pytest.mark.asyncio
+async def test_async_session_ctx_close_session_even_with_exception(db, mocker: MockerFixture):
+    session = mocker.AsyncMock()
+    mocker.patch.object(db, "_session_factory", new=mocker.Mock(return_value=session))
+    with pytest.raises(RuntimeError):
+        async with db.async_session_ctx():
+            raise RuntimeError()
+    session.close.assert_awaited()
+    assert _async_session.get() is None
+
+
+def test_error_if_no_async_session_ctx(db):
+    with pytest.raises(AssertionError):
+        db.session
+
+
+@pytest.mark.asyncio
+async def test_async_middlewares_commit_request_writes():
+    db = AsyncDatabase("sqlite+aiosqlite:///async_test.db")
+    async with db.engine.begin() as conn:
+        await conn.run_sync(metadata.create_all)
+
+    async def endpoint(request):
+        await db.session.execute(insert(users).values(name="Pierre"))
+        return PlainTextResponse("created", status_code=201)
+
+    app = Starlette(routes=[Route("/", endpoint, methods=["POST"])])
+    app.add_middleware(AsyncAutocommitMiddleware, db=db)
+    app.add_middleware(AsyncDatabaseMiddleware, db=db)
+    messages = []
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    async def send(message):
+        messages.append(message)
+    scope = {"type": "http", "method": "POST", "path": "/", "headers": [], "query_string": b""}
+    try:
+        await app(scope, receive, send)
+        assert messages[0]["status"] == 201
+        async with db.async_session_ctx():
+            names = (await db.session.execute(select(users.c.name))).scalars().all()
+        assert names == ["Pierre"]
+    finally:
+        await db.engine.dispose()
+        os.remove("async_test.db")
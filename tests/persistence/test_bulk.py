@@ -0,0 +1,78 @@
+import pytest
+from pytest_mock import MockerFixture
+from sqlalchemy import Column, Integer, String, select
+from sqlalchemy.dialects import postgresql, mysql
+from sqlalchemy.orm import declarative_base
+
+from fast_sqlalchemy.persistence.bulk import chunked, upsert_statement
+from fast_sqlalchemy.persistence.database import Database
+
+Base = declarative_base()
+
+
+class User(Base):
+    __tablename__ = "users"
+    id = Column(Integer, primary_key=True)
+    email = Column(String, unique=True)
+    name = Column(String)
+
+
+@pytest.fixture()
+def db():
+    db = Database("sqlite://")
+    Base.metadata.create_all(db.engine)
+    with db.session_ctx():
+        yield db
+
+
+def users(db):
+    return db.session.execute(select(User.id, User.email, User.name).order_by(User.id)).all()
+
+
+def test_chunked():
+    assert list(chunked(iter(range(5)), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(chunked([], 2)) == []
+
+
+def test_bulk_insert_by_batches(db, mocker: MockerFixture):
+    execute = mocker.spy(db.session, "execute")
+    rows = ({"email": f"{i}@mail.com", "name": str(i)} for i in range(5))
+    assert db.bulk_insert(User, rows, batch_size=2) == 5
+    assert execute.call_count == 3
+    assert len(users(db)) == 5
+
+
+def test_bulk_upsert(db):
+    db.bulk_insert(User.__table__, [{"id": 1, "email": "a@mail.com", "name": "a"}])
+    count = db.bulk_upsert(User, [{"id": 1, "email": "a@mail.com", "name": "b"},
+                                  {"id": 2, "email": "c@mail.com", "name": "c"}], conflict_cols=["id"])
+    assert count == 2
+    assert users(db) == [(1, "a@mail.com", "b"), (2, "c@mail.com", "c")]
+
+
+def test_bulk_upsert_do_nothing(db):
+    db.bulk_insert(User, [{"id": 1, "email": "a@mail.com", "name": "a"}])
+    db.bulk_upsert(User, [{"email": "a@mail.com"}], conflict_cols=["email"])
+    assert users(db) == [(1, "a@mail.com", "a")]
+
+
+def test_upsert_statement_dialects():
+    table = User.__table__
+    stmt = upsert_statement("postgresql", table, ["id"], ["name"])
+    assert "ON CONFLICT (id) DO UPDATE SET name = excluded.name" in str(stmt.compile(dialect=postgresql.dialect()))
+    stmt = upsert_statement("mysql", table, ["id"], ["name"])
+    assert "ON DUPLICATE KEY UPDATE name = VALUES(name)" in str(stmt.compile(dialect=mysql.dialect()))
+    with pytest.raises(NotImplementedError):
+        upsert_statement("oracle", table, ["id"], ["name"])
+
+
+def test_bulk_update(db):
+    db.bulk_insert(User, [{"id": i, "email": f"{i}@mail.com", "name": str(i)} for i in range(3)])
+    assert db.bulk_update(User, [{"id": 0, "name": "zero"}, {"id": 2, "name": "two"}]) == 2
+    assert users(db) == [(0, "0@mail.com", "zero"), (1, "1@mail.com", "1"), (2, "2@mail.com", "two")]
+
+
+def test_bulk_update_with_key_cols(db):
+    db.bulk_insert(User, [{"email": "a@mail.com", "name": "a"}])
+    db.bulk_update(User, [{"email": "a@mail.com", "name": "b"}], key_cols=["email"])
+    assert users(db)[0].name == "b"
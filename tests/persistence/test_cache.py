@@ -0,0 +1,196 @@
+import pytest
+from pytest_mock import MockerFixture
+from sqlalchemy import Column, Integer, String, ForeignKey, select, insert, update, text
+from sqlalchemy.orm import declarative_base, aliased
+
+from fast_sqlalchemy.persistence.cache import QUERY_CACHE_KEY, QueryCache, MemoryBackend, statement_tables
+from fast_sqlalchemy.persistence.database import Database
+
+Base = declarative_base()
+
+
+class User(Base):
+    __tablename__ = "users"
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+
+
+class Account(Base):
+    __tablename__ = "accounts"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+
+
+@pytest.fixture()
+def db():
+    db = Database("sqlite://", query_cache=True)
+    Base.metadata.create_all(db.engine)
+    with db.session_ctx():
+        db.session.add_all([User(id=1, name="Pierre"), Account(id=1, user_id=1)])
+        db.session.commit()
+        yield db
+
+
+@pytest.fixture()
+def cursor_execute(db, mocker: MockerFixture):
+    return mocker.spy(db.engine.dialect, "do_execute")
+
+
+def test_statement_tables():
+    user_alias = aliased(User)
+    assert statement_tables(select(User.name).join(Account, Account.user_id == User.id)) == {"users", "accounts"}
+    assert statement_tables(select(user_alias)) == {"users"}
+    assert statement_tables(update(User).values(name="name")) == {"users"}
+
+
+def test_query_cache():
+    cache = QueryCache()
+    cache.set("users", "result 1", ["users"])
+    cache.set("join", "result 2", ["users", "accounts"])
+    cache.set("accounts", "result 3", ["accounts"])
+    cache.invalidate(["users"])
+    assert cache.get("users") is None and cache.get("join") is None
+    assert cache.get("accounts") == "result 3"
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_repeated_select_hits_the_cache(db, cursor_execute):
+    first = db.session.execute(select(User).where(User.id == 1)).scalar_one()
+    second = db.session.execute(select(User).where(User.id == 1)).scalar_one()
+    assert first is second
+    db.session.execute(select(User).where(User.id == 2)).all()
+    assert cursor_execute.call_count == 2
+
+
+def test_flush_invalidates_written_tables(db, cursor_execute):
+    db.session.execute(select(User)).all()
+    db.session.execute(select(Account)).all()
+    db.session.add(User(id=2, name="Roger"))
+    db.session.flush()
+    assert len(db.session.execute(select(User)).all()) == 2
+    db.session.execute(select(Account)).all()
+    assert cursor_execute.call_count == 4
+
+
+def test_dml_statement_invalidates_its_table(db):
+    db.session.execute(select(User.name)).all()
+    db.session.execute(update(User).values(name="Roger"))
+    assert db.session.execute(select(User.name)).scalar() == "Roger"
+    db.session.execute(insert(User).values(id=2, name="Paul"))
+    assert len(db.session.execute(select(User.name)).all()) == 2
+
+
+def test_text_statement_clears_the_cache(db):
+    db.session.execute(select(User.name)).all()
+    db.session.execute(text("update users set name = 'Roger'"))
+    assert db.session.execute(select(User.name)).scalar() == "Roger"
+
+
+def test_commit_clears_the_cache(db):
+    db.session.execute(select(User.name)).all()
+    assert len(db.session.info[QUERY_CACHE_KEY]) == 1
+    db.session.commit()
+    assert len(db.session.info[QUERY_CACHE_KEY]) == 0
+
+
+def test_no_cache_by_default():
+    db = Database("sqlite://")
+    with db.session_ctx():
+        db.session.execute(text("select 1"))
+        assert QUERY_CACHE_KEY not in db.session.info
+
+
+@pytest.fixture()
+def cached_db(tmp_path):
+    db = Database(f"sqlite:///{tmp_path / 'cache.db'}", cache_backend=MemoryBackend())
+    Base.metadata.create_all(db.engine)
+    with db.session_ctx():
+        db.session.add_all([User(id=1, name="Pierre"), User(id=2, name="Paul")])
+        db.session.commit()
+    return db
+
+
+def test_memory_backend_lru():
+    backend = MemoryBackend(max_size=2)
+    backend.set("a", b"a", ["users"])
+    backend.set("b", b"b", ["users"])
+    backend.get("a")
+    backend.set("c", b"c", ["accounts"])
+    assert backend.get("b") is None
+    assert backend.get("a") == b"a" and backend.get("c") == b"c"
+    backend.invalidate(["users"])
+    assert backend.get("a") is None
+    assert len(backend) == 1
+
+
+def test_memory_backend_ttl(mocker: MockerFixture):
+    monotonic = mocker.patch("fast_sqlalchemy.persistence.cache.time.monotonic", return_value=0)
+    backend = MemoryBackend(ttl=10)
+    backend.set("a", b"a", [])
+    backend.set("b", b"b", [], ttl=30)
+    monotonic.return_value = 20
+    assert backend.get("a") is None
+    assert backend.get("b") == b"b"
+
+
+def test_cached_get_across_sessions(cached_db, mocker: MockerFixture):
+    do_execute = mocker.spy(cached_db.engine.dialect, "do_execute")
+    with cached_db.session_ctx():
+        assert cached_db.cached_get(User, 1).name == "Pierre"
+    with cached_db.session_ctx():
+        user = cached_db.cached_get(User, 1)
+        assert user.name == "Pierre"
+        assert user in cached_db.session
+        assert cached_db.cached_get(User, 2).name == "Paul"
+    assert do_execute.call_count == 2
+    assert cached_db.cache.stats() == {"hits": 1, "misses": 2, "hit_ratio": 1 / 3}
+
+
+def test_cached_query_with_core_statement(cached_db):
+    for _ in range(2):
+        with cached_db.session_ctx():
+            assert cached_db.cached_query(select(User.name).order_by(User.id)).scalars().all() == ["Pierre", "Paul"]
+    assert cached_db.cache.hits == 1
+
+
+def test_commit_invalidates_written_tables(cached_db):
+    with cached_db.session_ctx():
+        cached_db.cached_get(User, 1)
+        cached_db.session.execute(update(User).where(User.id == 1).values(name="Roger"))
+        # the session which wrote the table reads its own write
+        assert cached_db.cached_get(User, 1).name == "Roger"
+        cached_db.session.commit()
+    with cached_db.session_ctx():
+        assert cached_db.cached_get(User, 1).name == "Roger"
+    assert cached_db.cache.misses == 2
+
+
+def test_rollback_keeps_cached_results(cached_db):
+    with cached_db.session_ctx():
+        user = cached_db.cached_get(User, 1)
+        user.name = "Roger"
+        cached_db.session.flush()
+        cached_db.session.rollback()
+    with cached_db.session_ctx():
+        assert cached_db.cached_get(User, 1).name == "Pierre"
+    assert cached_db.cache.hits == 1
+
+
+def test_uncommitted_writes_are_not_cached(cached_db):
+    stmt = select(User.name).where(User.id == 2)
+    with cached_db.session_ctx():
+        cached_db.session.execute(update(User).where(User.id == 2).values(name="Uncommitted"))
+        assert cached_db.cached_query(stmt).scalar() == "Uncommitted"
+        cached_db.session.rollback()
+    with cached_db.session_ctx():
+        cached_db.session.add(User(id=3, name="Pending"))
+        assert cached_db.cached_query(select(User.name).where(User.id == 1)).scalar() == "Pierre"
+    assert len(cached_db.cache.backend) == 0
+    with cached_db.session_ctx():
+        assert cached_db.cached_query(stmt).scalar() == "Paul"
+
+
+def test_error_if_no_cache_backend(db):
+    with pytest.raises(AssertionError):
+        db.cached_get(User, 1)
@@ -1,5 +1,6 @@
 import pytest
 from pytest_mock import MockerFixture
+from sqlalchemy import text, select, column, table
 from sqlalchemy.engine import make_url
 from sqlalchemy.orm import Session, sessionmaker
 
@@ -56,4 +57,38 @@ def test_ctx_within_ctx(db):
             def inner():
                 assert _session.get() == s2
             inner()
-        assert _session.get() == s1
\ No newline at end of file
+        assert _session.get() == s1
+
+def test_lazy_session_ctx_create_session_on_access(db, mocker: MockerFixture):
+    session = mocker.Mock()
+    factory = mocker.patch.object(db, "_session_factory", new=mocker.Mock(return_value=session))
+    with db.session_ctx(lazy=True):
+        factory.assert_not_called()
+        assert db.has_session is False
+        assert db.session is session
+        assert db.session is session
+        assert db.has_session is True
+    factory.assert_called_once()
+    session.close.assert_called()
+    assert _session.get() is None
+
+def test_lazy_session_ctx_without_access(db, mocker: MockerFixture):
+    factory = mocker.patch.object(db, "_session_factory", new=mocker.Mock())
+    with db.session_ctx(lazy=True):
+        pass
+    factory.assert_not_called()
+    assert db.has_session is False
+
+
+def test_stream(db, mocker: MockerFixture):
+    with db.session_ctx():
+        db.session.execute(text("create table numbers (n integer)"))
+        db.session.execute(text("insert into numbers values (:n)"), [{"n": n} for n in range(5)])
+        db.session.commit()
+        execute = mocker.spy(db._session_factory.class_, "execute")
+        rows = db.stream(select(column("n")).select_from(table("numbers")), chunk_size=2)
+        # the statement is executed on the first iteration by a session of its own
+        execute.assert_not_called()
+        assert [row.n for row in rows] == [0, 1, 2, 3, 4]
+        assert execute.call_args.args[0] is not db.session
+        assert execute.call_args.args[1].get_execution_options() == {"stream_results": True, "yield_per": 2}
@@ -1,35 +1,212 @@
+import asyncio
+
 import pytest
 from pytest_mock import MockerFixture
+from starlette.applications import Starlette
+from starlette.responses import StreamingResponse, PlainTextResponse
+from starlette.routing import Route
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from fast_sqlalchemy.persistence.database import Database
+from fast_sqlalchemy.persistence.middlewares import DatabaseMiddleware, AutocommitMiddleware, \
+    AsyncDatabaseMiddleware, AsyncAutocommitMiddleware, write_behind
 
-from fast_sqlalchemy.persistence.middlewares import DatabaseMiddleware, AutocommitMiddleware
 
+def asgi_app(status=200):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+    return app
 
 
 @pytest.mark.asyncio
 async def test_init_session_context(mocker: MockerFixture):
-    db_mock = mocker.MagicMock()
-    db_middleware = DatabaseMiddleware(mocker.Mock(), db=db_mock)
-    call_next = mocker.AsyncMock()
-    await db_middleware.dispatch(mocker.Mock(), call_next)
+    db_mock = mocker.MagicMock(pool_metrics=None, profiler=None)
+    app = mocker.AsyncMock()
+    db_middleware = DatabaseMiddleware(app, db=db_mock)
+    await db_middleware({"type": "http"}, mocker.AsyncMock(), mocker.AsyncMock())
     db_mock.session_ctx.assert_called()
-    call_next.assert_called()
+    app.assert_called()
+
+@pytest.mark.asyncio
+async def test_no_session_context_if_not_http(mocker: MockerFixture):
+    db_mock = mocker.MagicMock()
+    app = mocker.AsyncMock()
+    db_middleware = DatabaseMiddleware(app, db=db_mock)
+    await db_middleware({"type": "lifespan"}, mocker.AsyncMock(), mocker.AsyncMock())
+    db_mock.session_ctx.assert_not_called()
+    app.assert_called()
 
 @pytest.mark.asyncio
 async def test_autocommit_middleware(mocker: MockerFixture):
     db_mock = mocker.MagicMock()
-    autocommit_middleware = AutocommitMiddleware(mocker.Mock(), db=db_mock)
-    response = mocker.Mock(status_code=200)
-    call_next = mocker.AsyncMock(return_value=response)
-    await autocommit_middleware.dispatch(mocker.Mock(), call_next)
-    call_next.assert_called()
-    db_mock.session.commit.assert_called()
+    autocommit_middleware = AutocommitMiddleware(asgi_app(200), db=db_mock)
+    send = mocker.AsyncMock()
+    await autocommit_middleware({"type": "http"}, mocker.AsyncMock(), send)
+    assert send.call_count == 2
+    db_mock.session.commit.assert_called_once()
 
 @pytest.mark.asyncio
 async def test_no_autocommit_middleware_if_status_above_400(mocker: MockerFixture):
     db_mock = mocker.MagicMock()
-    autocommit_middleware = AutocommitMiddleware(mocker.Mock(), db=db_mock)
-    response = mocker.Mock(status_code=400)
-    call_next = mocker.AsyncMock(return_value=response)
-    await autocommit_middleware.dispatch(mocker.Mock(), call_next)
-    call_next.assert_called()
+    autocommit_middleware = AutocommitMiddleware(asgi_app(400), db=db_mock)
+    send = mocker.AsyncMock()
+    await autocommit_middleware({"type": "http"}, mocker.AsyncMock(), send)
+    assert send.call_count == 2
     db_mock.session.commit.assert_not_called()
+    db_mock.session.rollback.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_lazy_session_context(mocker: MockerFixture):
+    db_mock = mocker.MagicMock(pool_metrics=None, profiler=None)
+    db_middleware = DatabaseMiddleware(mocker.AsyncMock(), db=db_mock, lazy=True)
+    await db_middleware({"type": "http"}, mocker.AsyncMock(), mocker.AsyncMock())
+    db_mock.session_ctx.assert_called_with(lazy=True)
+
+@pytest.mark.asyncio
+async def test_no_autocommit_without_session(mocker: MockerFixture):
+    db = Database("sqlite://")
+    factory = mocker.patch.object(db, "_session_factory")
+    app = DatabaseMiddleware(AutocommitMiddleware(asgi_app(200), db=db), db=db, lazy=True)
+    await app({"type": "http"}, mocker.AsyncMock(), mocker.AsyncMock())
+    factory.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_commit_before_response_is_sent(mocker: MockerFixture):
+    calls = []
+    db_mock = mocker.MagicMock()
+    db_mock.session.commit.side_effect = lambda: calls.append("commit")
+    async def send(message):
+        calls.append(message["type"])
+    await AutocommitMiddleware(asgi_app(200), db=db_mock)({"type": "http"}, mocker.AsyncMock(), send)
+    assert calls == ["commit", "http.response.start", "http.response.body"]
+
+@pytest.mark.asyncio
+async def test_write_behind_commit_after_response(mocker: MockerFixture):
+    calls = []
+    db_mock = mocker.MagicMock()
+    db_mock.session.commit.side_effect = lambda: calls.append("commit")
+    async def send(message):
+        calls.append(message["type"])
+    await AutocommitMiddleware(asgi_app(200), db=db_mock, write_behind=True)({"type": "http"},
+                                                                             mocker.AsyncMock(), send)
+    assert calls == ["http.response.start", "http.response.body", "commit"]
+
+@pytest.mark.asyncio
+async def test_write_behind_endpoint(mocker: MockerFixture):
+    calls = []
+    db_mock = mocker.MagicMock()
+    db_mock.session.commit.side_effect = lambda: calls.append("commit")
+
+    @write_behind
+    async def deferred(request):
+        return PlainTextResponse("deferred")
+
+    async def immediate(request):
+        return PlainTextResponse("immediate")
+
+    app = AutocommitMiddleware(Starlette(routes=[Route("/deferred", deferred), Route("/immediate", immediate)]),
+                               db=db_mock)
+    async def send(message):
+        calls.append(message["type"])
+    for path in ("/deferred", "/immediate"):
+        scope = {"type": "http", "method": "GET", "path": path, "headers": [], "query_string": b""}
+        await app(scope, mocker.AsyncMock(), send)
+    assert calls == ["http.response.start", "http.response.body", "commit",
+                     "commit", "http.response.start", "http.response.body"]
+
+@pytest.mark.asyncio
+async def test_write_behind_commit_error(mocker: MockerFixture):
+    db_mock = mocker.MagicMock()
+    error = Exception("commit failed")
+    db_mock.session.commit.side_effect = error
+    on_commit_error = mocker.MagicMock()
+    send = mocker.AsyncMock()
+    scope = {"type": "http"}
+    await AutocommitMiddleware(asgi_app(200), db=db_mock, write_behind=True,
+                               on_commit_error=on_commit_error)(scope, mocker.AsyncMock(), send)
+    assert send.call_count == 2
+    db_mock.session.rollback.assert_called_once()
+    on_commit_error.assert_called_once_with(error, scope)
+
+@pytest.mark.asyncio
+async def test_session_open_while_streaming_response(mocker: MockerFixture):
+    # the body is produced in the threadpool while the session is closed in the event loop
+    db = Database("sqlite://", connect_args={"check_same_thread": False})
+    events = []
+    close = Session.close
+    def close_spy(session):
+        events.append("close")
+        close(session)
+    mocker.patch.object(Session, "close", close_spy)
+
+    def body():
+        for i in range(3):
+            db.session.execute(text("select 1"))
+            events.append(f"chunk {i}")
+            yield str(i)
+
+    async def endpoint(request):
+        return StreamingResponse(body())
+
+    app = Starlette(routes=[Route("/", endpoint)])
+    app.add_middleware(AutocommitMiddleware, db=db)
+    app.add_middleware(DatabaseMiddleware, db=db)
+    messages = []
+    disconnected = asyncio.Event()
+    async def receive():
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+    async def send(message):
+        messages.append(message)
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [], "query_string": b""}
+    await app(scope, receive, send)
+    assert b"".join(m.get("body", b"") for m in messages) == b"012"
+    assert events == ["chunk 0", "chunk 1", "chunk 2", "close"]
+
+@pytest.mark.asyncio
+async def test_init_async_session_context(mocker: MockerFixture):
+    db_mock = mocker.MagicMock()
+    app = mocker.AsyncMock()
+    db_middleware = AsyncDatabaseMiddleware(app, db=db_mock)
+    await db_middleware({"type": "http"}, mocker.AsyncMock(), mocker.AsyncMock())
+    db_mock.async_session_ctx.assert_called()
+    app.assert_called()
+
+@pytest.mark.asyncio
+async def test_async_autocommit_middleware(mocker: MockerFixture):
+    db_mock = mocker.MagicMock()
+    db_mock.session.commit = mocker.AsyncMock()
+    autocommit_middleware = AsyncAutocommitMiddleware(asgi_app(200), db=db_mock)
+    await autocommit_middleware({"type": "http"}, mocker.AsyncMock(), mocker.AsyncMock())
+    db_mock.session.commit.assert_awaited()
+
+@pytest.mark.asyncio
+async def test_no_async_autocommit_if_status_above_400(mocker: MockerFixture):
+    db_mock = mocker.MagicMock()
+    db_mock.session.commit = mocker.AsyncMock()
+    db_mock.session.rollback = mocker.AsyncMock()
+    autocommit_middleware = AsyncAutocommitMiddleware(asgi_app(400), db=db_mock)
+    await autocommit_middleware({"type": "http"}, mocker.AsyncMock(), mocker.AsyncMock())
+    db_mock.session.commit.assert_not_awaited()
+    db_mock.session.rollback.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_async_write_behind_commit_error(mocker: MockerFixture):
+    calls = []
+    db_mock = mocker.MagicMock()
+    error = Exception("commit failed")
+    async def commit():
+        calls.append("commit")
+        raise error
+    db_mock.session.commit = commit
+    db_mock.session.rollback = mocker.AsyncMock()
+    on_commit_error = mocker.AsyncMock()
+    async def send(message):
+        calls.append(message["type"])
+    await AsyncAutocommitMiddleware(asgi_app(200), db=db_mock, write_behind=True,
+                                    on_commit_error=on_commit_error)({"type": "http"}, mocker.AsyncMock(), send)
+    assert calls == ["http.response.start", "http.response.body", "commit"]
+    db_mock.session.rollback.assert_awaited_once()
+    on_commit_error.assert_awaited_once()
@@ -0,0 +1,76 @@
+import pytest
+from pytest_mock import MockerFixture
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool
+
+from fast_sqlalchemy.persistence.context import _pool_wait
+from fast_sqlalchemy.persistence.database import Database
+from fast_sqlalchemy.persistence.middlewares import DatabaseMiddleware
+from fast_sqlalchemy.persistence.pool import Histogram, prometheus_endpoint
+
+
+@pytest.fixture()
+def db(tmp_path):
+    return Database(f"sqlite:///{tmp_path / 'pool.db'}", pool_metrics=True, poolclass=QueuePool, pool_size=2)
+
+
+def test_histogram():
+    histogram = Histogram(buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 2):
+        histogram.observe(value)
+    assert histogram.cumulative_counts() == {"0.1": 2, "1": 3, "+Inf": 4}
+    assert histogram.sum == 2.65 and histogram.count == 4
+
+
+def test_pool_stats(db):
+    with db.session_ctx():
+        db.session.execute(text("select 1"))
+        stats = db.pool_stats()
+        assert stats["checked_out"] == 1
+    stats = db.pool_stats()
+    assert stats["size"] == 2
+    assert stats["checked_out"] == 0 and stats["checked_in"] == 1
+    assert stats["connects"] == 1 and stats["checkouts"] == 1
+    assert stats["connection_age_max"] > 0
+    assert stats["wait_time"]["count"] == 1
+    assert stats["wait_time"]["buckets"]["+Inf"] == 1
+
+
+def test_instrument_pool_after_dispose(db):
+    db.engine.dispose()
+    with db.engine.connect():
+        pass
+    assert db.pool_stats()["wait_time"]["count"] == 1
+
+
+def test_prometheus_text(db):
+    with db.engine.connect():
+        pass
+    text_format = db.pool_metrics.prometheus()
+    assert "# TYPE sqlalchemy_pool_size gauge\nsqlalchemy_pool_size 2\n" in text_format
+    assert "sqlalchemy_pool_checkouts_total 1\n" in text_format
+    assert 'sqlalchemy_pool_wait_seconds_bucket{le="+Inf"} 1\n' in text_format
+    assert "sqlalchemy_pool_wait_seconds_count 1\n" in text_format
+
+
+@pytest.mark.asyncio
+async def test_prometheus_endpoint(db, mocker: MockerFixture):
+    response = await prometheus_endpoint(db.pool_metrics)(mocker.Mock())
+    assert response.body.startswith(b"# TYPE sqlalchemy_pool_size gauge")
+
+
+def test_error_without_pool_metrics():
+    with pytest.raises(AssertionError):
+        Database("sqlite://").pool_stats()
+
+
+@pytest.mark.asyncio
+async def test_request_pool_wait(db, mocker: MockerFixture):
+    async def app(scope, receive, send):
+        db.session.execute(text("select 1"))
+        assert _pool_wait.get() is scope["state"]["db_pool"]
+    scope = {"type": "http"}
+    await DatabaseMiddleware(app, db=db)(scope, mocker.AsyncMock(), mocker.AsyncMock())
+    assert scope["state"]["db_pool"].checkouts == 1
+    assert scope["state"]["db_pool"].wait_time > 0
+    assert _pool_wait.get() is None
@@ -0,0 +1,76 @@
+import logging
+import threading
+
+import pytest
+from pytest_mock import MockerFixture
+from sqlalchemy import text
+
+from fast_sqlalchemy.persistence.context import _query_stats
+from fast_sqlalchemy.persistence.database import Database
+from fast_sqlalchemy.persistence.middlewares import DatabaseMiddleware
+from fast_sqlalchemy.persistence.profiler import QueryStats
+from fast_sqlalchemy.testing import query_budget
+
+
+@pytest.fixture()
+def db():
+    return Database("sqlite://", profile_queries=True)
+
+
+def test_query_stats():
+    stats = QueryStats(n_plus_one_threshold=2, max_slowest=2)
+    stats.record("select  *\n from users", 0.1)
+    stats.record("select * from users", 0.3)
+    stats.record("select * from accounts", 0.2)
+    assert stats.count == 3
+    assert stats.total_time == pytest.approx(0.6)
+    assert stats.slowest == [(0.3, "select * from users"), (0.2, "select * from accounts")]
+    assert stats.n_plus_one == [("select * from users", 2)]
+    assert stats.server_timing() == 'db;dur=600.00;desc="3 queries"'
+
+
+def test_profile_queries_of_the_context(db):
+    with db.session_ctx():
+        with db.profiler.profile() as stats:
+            db.session.execute(text("select 1"))
+            db.session.execute(text("select 2"))
+        db.session.execute(text("select 3"))
+    assert stats.count == 2
+    assert list(stats.statements) == ["select 1", "select 2"]
+    assert _query_stats.get() is None
+
+
+def test_no_profiling_without_option():
+    assert Database("sqlite://").profiler is None
+
+
+@pytest.mark.asyncio
+async def test_middleware_server_timing_header(db, mocker: MockerFixture, caplog):
+    caplog.set_level("INFO")
+    async def app(scope, receive, send):
+        for _ in range(5):
+            db.session.execute(text("select 1"))
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+    send = mocker.AsyncMock()
+    await DatabaseMiddleware(app, db=db)({"type": "http", "method": "GET", "path": "/users"},
+                                         mocker.AsyncMock(), send)
+    headers = send.call_args.args[0]["headers"]
+    assert headers[0][0] == b"server-timing"
+    assert headers[0][1].endswith(b'desc="5 queries"')
+    info, warning = caplog.records
+    assert info.sql_queries == 5 and info.path == "/users"
+    assert warning.levelno == logging.WARNING and "N+1" in warning.message
+
+
+def test_query_budget(db):
+    def request():
+        with db.session_ctx():
+            db.session.execute(text("select 1"))
+    with query_budget(db, 1):
+        thread = threading.Thread(target=request)
+        thread.start()
+        thread.join()
+    with pytest.raises(AssertionError):
+        with query_budget(db, 1):
+            request()
+            request()
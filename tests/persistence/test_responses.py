@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+from sqlalchemy import Column, Integer, String, select, insert
+from sqlalchemy.orm import declarative_base
+from starlette.applications import Starlette
+from starlette.routing import Route
+
+from fast_sqlalchemy.persistence.database import Database
+from fast_sqlalchemy.persistence.middlewares import DatabaseMiddleware, AutocommitMiddleware
+from fast_sqlalchemy.persistence.responses import ndjson_response, csv_response
+
+Base = declarative_base()
+
+
+class User(Base):
+    __tablename__ = "users"
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+
+
+@pytest.fixture()
+def db(tmp_path):
+    db = Database(f"sqlite:///{tmp_path / 'stream.db'}")
+    Base.metadata.create_all(db.engine)
+    with db.engine.begin() as conn:
+        conn.execute(insert(User.__table__), [{"name": f"user {i}"} for i in range(3)])
+    return db
+
+
+async def get_body(db, response_factory, autocommit=False):
+    async def endpoint(request):
+        return response_factory()
+
+    app = Starlette(routes=[Route("/", endpoint)])
+    if autocommit:
+        app = AutocommitMiddleware(app, db=db)
+    app = DatabaseMiddleware(app, db=db)
+    messages = []
+    disconnected = asyncio.Event()
+    async def receive():
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+    async def send(message):
+        messages.append(message)
+    await app({"type": "http", "method": "GET", "path": "/", "headers": [], "query_string": b""}, receive, send)
+    return messages[0], b"".join(m.get("body", b"") for m in messages)
+
+
+@pytest.mark.asyncio
+async def test_ndjson_response(db):
+    start, body = await get_body(db, lambda: ndjson_response(db, select(User.id, User.name), chunk_size=2))
+    assert (b"content-type", b"application/x-ndjson") in start["headers"]
+    assert body == b'{"id": 1, "name": "user 0"}\n{"id": 2, "name": "user 1"}\n{"id": 3, "name": "user 2"}\n'
+
+
+@pytest.mark.asyncio
+async def test_ndjson_response_with_serializer(db):
+    start, body = await get_body(db, lambda: ndjson_response(db, select(User), serializer=lambda row: row.User.name))
+    assert body == b'"user 0"\n"user 1"\n"user 2"\n'
+
+
+@pytest.mark.asyncio
+async def test_csv_response(db):
+    start, body = await get_body(db, lambda: csv_response(db, select(User.id, User.name), chunk_size=2))
+    assert body == b"id,name\r\n1,user 0\r\n2,user 1\r\n3,user 2\r\n"
+
+
+@pytest.mark.asyncio
+async def test_stream_with_autocommit(db):
+    def response():
+        # the session of the request is committed when the response starts
+        db.session.execute(insert(User.__table__).values(name="new user"))
+        return ndjson_response(db, select(User.name), chunk_size=1)
+
+    start, body = await get_body(db, response, autocommit=True)
+    # the rows are fetched once the response started, after the commit
+    assert body.count(b"\n") == 4
+    with db.session_ctx():
+        assert db.session.execute(select(User.name).where(User.name == "new user")).scalar() == "new user"
@@ -0,0 +1,96 @@
+import pytest
+from pytest_mock import MockerFixture
+from sqlalchemy import Column, Integer, String, select, create_engine, insert
+from sqlalchemy.orm import declarative_base
+
+from fast_sqlalchemy.persistence.database import Database
+from fast_sqlalchemy.persistence.routing import RoutingSession, round_robin, least_connections
+
+Base = declarative_base()
+
+
+class User(Base):
+    __tablename__ = "users"
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+
+
+@pytest.fixture()
+def db(tmp_path):
+    urls = {name: f"sqlite:///{tmp_path / name}.db" for name in ("primary", "replica_1", "replica_2")}
+    for name, url in urls.items():
+        engine = create_engine(url)
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(insert(User.__table__).values(name=name))
+        engine.dispose()
+    return Database(urls["primary"], replica_urls=[urls["replica_1"], urls["replica_2"]])
+
+
+def read_name(db):
+    return db.session.execute(select(User.name)).scalar()
+
+
+def test_session_factory_without_replicas():
+    db = Database("sqlite://")
+    assert db.replicas == []
+    with db.session_ctx() as session:
+        assert not isinstance(session, RoutingSession)
+
+
+def test_reads_are_sent_to_replicas_round_robin(db):
+    with db.session_ctx() as session:
+        assert isinstance(session, RoutingSession)
+        assert [read_name(db) for _ in range(3)] == ["replica_1", "replica_2", "replica_1"]
+
+
+def test_writes_stick_to_primary(db):
+    with db.session_ctx():
+        assert read_name(db) == "replica_1"
+        db.session.add(User(name="new"))
+        db.session.flush()
+        names = db.session.execute(select(User.name)).scalars().all()
+        assert names == ["primary", "new"]
+        assert read_name(db) == "primary"
+    with db.session_ctx():
+        assert read_name(db) == "replica_2"
+
+
+def test_pending_writes_are_read_on_primary(db):
+    with db.session_ctx():
+        db.session.add(User(name="new"))
+        assert read_name(db) == "primary"
+
+
+def test_commit_with_routing_session(db):
+    with db.session_ctx():
+        db.session.add(User(name="new"))
+        db.session.commit()
+    with create_engine(db.url).connect() as conn:
+        assert conn.execute(select(User.name)).scalars().all() == ["primary", "new"]
+
+
+def test_select_for_update_on_primary(db):
+    with db.session_ctx():
+        assert db.session.execute(select(User.name).with_for_update()).scalar() == "primary"
+
+
+def test_session_bound_to_connection_is_not_routed(db):
+    with db.engine.connect() as conn:
+        db._session_factory.configure(bind=conn)
+        with db.session_ctx():
+            assert read_name(db) == "primary"
+
+
+def test_round_robin(mocker: MockerFixture):
+    replicas = [mocker.Mock(), mocker.Mock()]
+    select_replica = round_robin(replicas)
+    assert [select_replica() for _ in range(3)] == [replicas[0], replicas[1], replicas[0]]
+
+
+def test_least_connections(mocker: MockerFixture):
+    busy = mocker.Mock()
+    busy.pool.checkedout.return_value = 5
+    idle = mocker.Mock()
+    idle.pool.checkedout.return_value = 1
+    assert least_connections([busy, idle])() is idle
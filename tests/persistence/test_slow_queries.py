@@ -0,0 +1,93 @@
+import logging
+import os
+
+import pytest
+from pytest_mock import MockerFixture
+from sqlalchemy import text, MetaData, select
+from sqlalchemy.pool import StaticPool
+
+from fast_sqlalchemy.logging.handlers import DatabaseHandler
+from fast_sqlalchemy.persistence.database import Database
+from fast_sqlalchemy.persistence.middlewares import DatabaseMiddleware
+from fast_sqlalchemy.persistence.slow_queries import parameters_shape, slow_query_table, map_slow_query
+
+LOGGER = "fast_sqlalchemy.persistence.slow_queries"
+
+
+def test_parameters_shape():
+    assert parameters_shape({"id": 1, "name": "secret"}) == "{id: int, name: str}"
+    assert parameters_shape((1, "secret")) == "(int, str)"
+    assert parameters_shape([(1,), (2,)], executemany=True) == "2 x (int)"
+
+
+def test_no_slow_query_log_without_threshold():
+    assert Database("sqlite://").slow_query_log is None
+
+
+def test_log_statements_above_threshold(caplog):
+    caplog.set_level("WARNING", logger=LOGGER)
+    db = Database("sqlite://", slow_query_threshold=0)
+    with db.session_ctx():
+        db.session.execute(text("select  :value\n  as v"), {"value": "secret"})
+    record, = caplog.records
+    assert record.sql == "select ? as v"
+    assert record.parameters == "(str)"
+    assert record.duration_ms >= 0
+    assert record.route is None and record.plan is None
+    assert "secret" not in record.getMessage()
+
+
+def test_fast_statements_are_not_logged(caplog):
+    caplog.set_level("WARNING", logger=LOGGER)
+    db = Database("sqlite://", slow_query_threshold=10)
+    with db.session_ctx():
+        db.session.execute(text("select 1"))
+    assert caplog.records == []
+
+
+def test_explain_slow_select(caplog):
+    caplog.set_level("WARNING", logger=LOGGER)
+    db = Database("sqlite:///slow_queries.db", slow_query_threshold=0, explain_slow_queries=True)
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(text("create table users (id integer primary key, name varchar)"))
+        caplog.clear()
+        with db.session_ctx():
+            db.session.execute(text("select * from users where id = :id"), {"id": 1})
+        db.slow_query_log.shutdown()
+        record, = caplog.records
+        assert "USING INTEGER PRIMARY KEY" in record.plan
+    finally:
+        db.engine.dispose()
+        os.remove("slow_queries.db")
+
+
+@pytest.mark.asyncio
+async def test_route_of_the_slow_query(mocker: MockerFixture, caplog):
+    caplog.set_level("WARNING", logger=LOGGER)
+    db = Database("sqlite://", slow_query_threshold=0)
+
+    async def app(scope, receive, send):
+        db.session.execute(text("select 1"))
+    await DatabaseMiddleware(app, db=db)({"type": "http", "method": "GET", "path": "/users"},
+                                         mocker.AsyncMock(), mocker.AsyncMock())
+    record, = caplog.records
+    assert record.route == "GET /users"
+
+
+def test_store_slow_queries_with_database_handler():
+    db = Database("sqlite://", slow_query_threshold=0, poolclass=StaticPool)
+    table = slow_query_table(MetaData())
+    table.create(db.engine)
+    handler = DatabaseHandler(db, table, map_slow_query)
+    logger = logging.getLogger(LOGGER)
+    logger.addHandler(handler)
+    try:
+        with db.session_ctx():
+            db.session.execute(text("select 1"))
+    finally:
+        logger.removeHandler(handler)
+    with db.engine.connect() as conn:
+        rows = conn.execute(select(table.c.sql, table.c.parameters)).all()
+    # the insert of the handler isn't logged itself
+    assert rows == [("select 1", "()")]
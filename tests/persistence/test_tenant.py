@@ -0,0 +1,74 @@
+import pytest
+from pytest_mock import MockerFixture
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool
+
+from fast_sqlalchemy.persistence.context import _tenant
+from fast_sqlalchemy.persistence.middlewares import TenantMiddleware
+from fast_sqlalchemy.persistence.tenant import TenantDatabase
+
+
+@pytest.fixture()
+def db(tmp_path):
+    return TenantDatabase(lambda tenant: f"sqlite:///{tmp_path / tenant}.db", max_connections=4,
+                          poolclass=QueuePool, pool_size=1, max_overflow=1)
+
+
+def test_session_bound_to_tenant_engine(db):
+    with db.tenant_ctx("first"):
+        with db.session_ctx():
+            db.session.execute(text("create table tenant (name varchar)"))
+            db.session.execute(text("insert into tenant values ('first')"))
+            db.session.commit()
+    with db.tenant_ctx("second"), db.session_ctx():
+        db.session.execute(text("create table tenant (name varchar)"))
+    with db.tenant_ctx("first"), db.session_ctx():
+        assert db.session.execute(text("select name from tenant")).scalar() == "first"
+    assert _tenant.get() is None
+
+
+def test_reuse_tenant_engine(db):
+    assert db.get_engine("first") is db.get_engine("first")
+
+
+def test_evict_least_recently_used_engine(db, mocker: MockerFixture):
+    first = db.get_engine("first")
+    dispose = mocker.spy(first, "dispose")
+    second = db.get_engine("second")
+    db.get_engine("first")
+    third = db.get_engine("third")
+    assert list(db._engines) == ["first", "third"]
+    dispose.assert_not_called()
+    assert db.get_engine("second") is not second
+    dispose.assert_called_once()
+    assert db.get_engine("third") is third
+
+
+def test_error_without_tenant(db):
+    with pytest.raises(AssertionError):
+        with db.session_ctx():
+            pass
+
+
+def test_database_attributes(db):
+    # the attributes of the Database are set by its constructor
+    assert db.cache is None and db.profiler is None and db.slow_query_log is None
+    assert db.queries is not None and db.transaction_metrics is not None
+
+
+@pytest.mark.parametrize("option", [{"pool_metrics": True}, {"profile_queries": True}, {"slow_query_threshold": 0},
+                                    {"replica_urls": ["sqlite://"]}])
+def test_unsupported_options(option):
+    with pytest.raises(ValueError):
+        TenantDatabase(lambda tenant: "sqlite://", **option)
+
+
+@pytest.mark.asyncio
+async def test_tenant_middleware(mocker: MockerFixture):
+    tenants = []
+    async def app(scope, receive, send):
+        tenants.append(_tenant.get())
+    middleware = TenantMiddleware(app, get_tenant=lambda scope: scope["tenant"])
+    await middleware({"type": "http", "tenant": "first"}, mocker.AsyncMock(), mocker.AsyncMock())
+    assert tenants == ["first"]
+    assert _tenant.get() is None
@@ -0,0 +1,132 @@
+import pytest
+from pytest_mock import MockerFixture
+from sqlalchemy import Column, Integer, String, select, func
+from sqlalchemy.exc import OperationalError, IntegrityError
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import StaticPool
+
+from fast_sqlalchemy.persistence.database import Database
+from fast_sqlalchemy.persistence.transaction import retryable_error_code
+
+Base = declarative_base()
+
+
+class User(Base):
+    __tablename__ = "users"
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+
+
+class DriverError(Exception):
+    def __init__(self, *args, pgcode=None):
+        super().__init__(*args)
+        self.pgcode = pgcode
+
+
+def locked_error():
+    return OperationalError("insert", {}, DriverError("database is locked"))
+
+
+@pytest.fixture()
+def db(mocker: MockerFixture):
+    mocker.patch("fast_sqlalchemy.persistence.transaction.time.sleep")
+    db = Database("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(db.engine)
+    return db
+
+
+def count_users(db):
+    with db.session_ctx():
+        return db.session.execute(select(func.count(User.id))).scalar()
+
+
+def test_retryable_error_code():
+    assert retryable_error_code(OperationalError("", {}, DriverError(pgcode="40P01")), "postgresql") == "40P01"
+    assert retryable_error_code(OperationalError("", {}, DriverError(pgcode="23505")), "postgresql") is None
+    assert retryable_error_code(OperationalError("", {}, DriverError(1213, "Deadlock found")), "mysql") == "1213"
+    assert retryable_error_code(locked_error(), "sqlite") == "database is locked"
+    assert retryable_error_code(ValueError(), "sqlite") is None
+
+
+def test_retry_the_transaction(db):
+    calls = []
+
+    @db.transaction(retries=2)
+    def create_user():
+        calls.append(1)
+        db.session.add(User(name="bob"))
+        db.session.flush()
+        if len(calls) == 1:
+            raise locked_error()
+    with db.session_ctx():
+        create_user()
+    assert len(calls) == 2
+    assert count_users(db) == 1
+    assert db.transaction_metrics.stats() == {"attempts": 2, "retries": 1, "exhausted": 0,
+                                              "errors": {"database is locked": 1}}
+
+
+def test_raise_when_the_retries_are_exhausted(db):
+    @db.transaction(retries=1)
+    def create_user():
+        raise locked_error()
+    with db.session_ctx():
+        with pytest.raises(OperationalError):
+            create_user()
+    assert db.transaction_metrics.exhausted == 1
+
+
+def test_dont_retry_other_errors(db):
+    calls = []
+
+    @db.transaction(retries=3)
+    def create_user():
+        calls.append(1)
+        raise IntegrityError("insert", {}, DriverError("UNIQUE constraint failed"))
+    with db.session_ctx():
+        with pytest.raises(IntegrityError):
+            create_user()
+    assert len(calls) == 1
+
+
+def test_savepoint_within_a_transaction(db):
+    @db.transaction()
+    def create_user():
+        db.session.add(User(name="alice"))
+        db.session.flush()
+        raise locked_error()
+    with db.session_ctx():
+        db.session.add(User(name="bob"))
+        db.session.flush()
+        with pytest.raises(OperationalError):
+            create_user()
+        db.session.commit()
+    with db.session_ctx():
+        assert db.session.execute(select(User.name)).scalars().all() == ["bob"]
+
+
+def test_transaction_context_manager(db):
+    with db.session_ctx():
+        with db.transaction():
+            db.session.add(User(name="bob"))
+    assert count_users(db) == 1
+    with pytest.raises(AssertionError):
+        with db.session_ctx(), db.transaction(retries=1):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_retry_async_function(db, mocker: MockerFixture):
+    sleep = mocker.patch("fast_sqlalchemy.persistence.transaction.asyncio.sleep")
+    calls = []
+
+    @db.transaction(retries=1)
+    async def create_user():
+        calls.append(1)
+        db.session.add(User(name="bob"))
+        if len(calls) == 1:
+            raise locked_error()
+    with db.session_ctx():
+        await create_user()
+    assert sleep.call_count == 1
+    assert count_users(db) == 1
@@ -0,0 +1,64 @@
+import sys
+import types
+
+import pytest
+from sqlalchemy import Column, Integer, String, select, text
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import QueuePool
+
+from fast_sqlalchemy.persistence.database import Database
+from fast_sqlalchemy.persistence.warmup import compile_statement
+
+Base = declarative_base()
+
+
+class User(Base):
+    __tablename__ = "users"
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+
+
+@pytest.fixture()
+def db():
+    db = Database("sqlite://")
+    Base.metadata.create_all(db.engine)
+    return db
+
+
+def test_compile_statement(db):
+    stmt = select(User).where(User.name == "bob")
+    assert not compile_statement(db.engine, stmt)
+    assert compile_statement(db.engine, select(User).where(User.name == "alice"))
+
+
+def test_warmup_prefills_the_compiled_cache(db):
+    db.queries.register(lambda: select(User).where(User.id == 1))
+    db.queries.register(lambda: (text("select * from users where name = :name"), {"name": ""}))
+    report = db.warmup()
+    assert report["compiled"] == 2 and report["already_cached"] == 0
+    with db.session_ctx():
+        db.session.execute(select(User).where(User.id == 2)).all()
+        db.session.execute(text("select * from users where name = :name"), {"name": "bob"}).all()
+    assert db.compiled_cache_stats() == {"hits": 2, "misses": 0, "hit_ratio": 1.0}
+
+
+def test_warmup_imports_the_modules(db):
+    module = types.ModuleType("registered_queries")
+    sys.modules["registered_queries"] = module
+    try:
+        db.queries.register(lambda: select(User))
+        report = db.warmup(modules=["registered_queries"])
+    finally:
+        del sys.modules["registered_queries"]
+    assert report["compiled"] == 1
+
+
+def test_warmup_opens_the_pool_connections():
+    db = Database("sqlite:///:memory:", poolclass=QueuePool, pool_size=3)
+    assert db.warmup()["connections"] == 3
+    assert db.engine.pool.checkedin() == 3
+
+
+def test_compiled_cache_stats_without_warmup(db):
+    with pytest.raises(AssertionError):
+        db.compiled_cache_stats()